@@ -0,0 +1,223 @@
+"""
+Whole-core inventories of slug nuclides
+
+The slug densities of all positions are held in one tensor by lattice.CompactLattice
+(densities[slugIndex[position], zaid, slug] in 1E24 atoms/cm^3, as the CSV material files),
+and the volume of fuel in every slug follows the pin geometry of buildSec():
+```
+type                            rods  pin diameter  slug height
+driver, C2776A, X402A, X412       91     0.3302        11.43
+HWD                               46     0.3302        11.43
+control, safety, HWCR, XX09       61     0.3302        11.43
+blanket                           19     1.0998        46.567
+```
+The mass of a nuclide is N * 1E24 * V * A / N_A, reduced by assembly, ring or type
+with NumPy, and returned as arrays or tidy DataFrames.
+
+Example
+-------
+```python
+>>> compact = CompactLattice.fromNested(lattice, slugTable(fuelSlugs))
+>>> inventory(compact, typeMap(), nuclides=('U235', 'U238', 'Pu'), by='ring')
+```
+"""
+import numpy as np
+import pandas as pd
+
+from lattice import RING_NUM, positions, locations
+
+AVOGADRO = 6.02214076E23
+
+# (rods, pin diameter, slug height) of the slugs in every type of assembly
+SLUG_GEOMETRY = {
+    'driver': (91, 0.3302, 11.43),
+    'C2776A': (91, 0.3302, 11.43),
+    'X402A': (91, 0.3302, 11.43),
+    'X412': (91, 0.3302, 11.43),
+    'HWD': (91 - 45, 0.3302, 11.43), # 45 of 91 rods are SS304 dummy rods
+    'control': (61, 0.3302, 11.43),
+    'safety': (61, 0.3302, 11.43),
+    'HWCR': (61, 0.3302, 11.43),
+    'XX09': (61, 0.3302, 11.43),
+    'blanket': (19, 1.0998, 46.567)
+}
+
+# The atomic numbers of elements to select nuclides by symbol
+ELEMENTS = {'Zr': 40, 'Mo': 42, 'Th': 90, 'Pa': 91, 'U': 92, 'Np': 93, 'Pu': 94, 'Am': 95, 'Cm': 96}
+
+# The standard atomic weights of natural elements (ZAID like 40000)
+NATURAL_WEIGHTS = {6: 12.011, 11: 22.990, 14: 28.085, 24: 51.996, 25: 54.938, 26: 55.845, 28: 58.693, 40: 91.224, 42: 95.95}
+
+
+def baseType(label) -> str:
+    """
+    The type of assembly without MK type or location, like 'driver' for 'driver-MKII@01A01'
+    """
+    label = label.split('@')[0]
+    for suffix in ('-MKIIA', '-MKII'):
+        if label.endswith(suffix):
+            return label[:-len(suffix)]
+    return label
+
+
+def atomicMass(zaids) -> np.ndarray:
+    """
+    The atomic mass in g/mol of every ZAID, approximated by its mass number
+    """
+    zaids = np.asarray(zaids)
+    A = zaids % 1000
+    A = np.where(A > 400, A - 400, A) # Metastable isomers, like 95642
+    natural = np.array([NATURAL_WEIGHTS.get(int(z), np.nan) for z in zaids // 1000])
+    return np.where(A > 0, A, natural).astype(float)
+
+
+def selectZaids(zaids, nuclide) -> np.ndarray:
+    """
+    The mask of ZAIDs of a nuclide, like 92235, 'U235' or an element like 'Pu'
+    """
+    zaids = np.asarray(zaids)
+    if not isinstance(nuclide, str):
+        return zaids == nuclide
+    symbol = nuclide.rstrip('0123456789')
+    if symbol not in ELEMENTS:
+        raise ValueError("Unknown nuclide {}, whose element should be in {}".format(nuclide, tuple(ELEMENTS)))
+    if symbol == nuclide:
+        return zaids // 1000 == ELEMENTS[symbol]
+    return zaids == ELEMENTS[symbol] * 1000 + int(nuclide[len(symbol):])
+
+
+def slugTable(fuelSlugs, ringNum=RING_NUM) -> list:
+    """
+    Arrange the slug materials of sections.fuelSlugs by position, for CompactLattice.fromNested()
+
+    Input
+    -----
+    fuelSlugs: list, (location, assemblyType, (DataFrame('ZAIDS', 'Density'), ...))
+
+    Return
+    ------
+    The DataFrame(ZAIDS, S1, S2, ...) at every position in the order of flat index, None without slug
+    """
+    index = {location: idx for idx, location in enumerate(locations(ringNum))}
+    slugs = [None] * len(index)
+    for location, assemblyType, mats in fuelSlugs:
+        frame = mats[0][['ZAIDS']].copy()
+        for idx, mat in enumerate(mats):
+            frame = frame.merge(mat.rename(columns={'Density': 'S{:d}'.format(idx+1)}), on='ZAIDS', how='outer')
+        slugs[index[location]] = frame.fillna(0.)
+    return slugs
+
+
+def slugVolumes(types) -> np.ndarray:
+    """
+    The volume of fuel in a slug of every position, 0 for the types without fuel
+    """
+    volumes = np.zeros(len(types))
+    for idx, label in enumerate(types):
+        if baseType(label) in SLUG_GEOMETRY:
+            rods, diameter, height = SLUG_GEOMETRY[baseType(label)]
+            volumes[idx] = rods * np.pi / 4 * diameter**2 * height
+    return volumes
+
+
+def slugMasses(compact, types, nuclides=('U235', 'U238', 'Pu')) -> np.ndarray:
+    """
+    The mass in g of nuclides in every slug of every position
+
+    Input
+    -----
+    compact: CompactLattice, with the slug densities
+    types: ArrayLike, the type of assembly at every position, like symmetry.typeMap()
+    nuclides: ArrayLike, see selectZaids()
+
+    Return
+    ------
+    np.ndarray, shape (positions, slugs, nuclides), 0 without slug
+    """
+    masks = np.stack([selectZaids(compact.zaids, nuclide) for nuclide in nuclides], axis=-1).astype(float)
+    weights = masks * np.nan_to_num(atomicMass(compact.zaids))[:, None]            # (zaids, nuclides)
+    perVolume = np.einsum('mzs,zn->msn', compact.densities, weights) * 1E24 / AVOGADRO  # (sets, slugs, nuclides) g/cm^3
+
+    masses = np.zeros((len(compact.codes), compact.densities.shape[2], len(nuclides)))
+    present = np.flatnonzero(compact.slugIndex >= 0)
+    masses[present] = perVolume[compact.slugIndex[present]] * slugVolumes(types)[present, None, None]
+    return masses
+
+
+def reduce(values, groups) -> tuple:
+    """
+    Sum the values of positions by groups
+
+    Return
+    ------
+    (keys, sums), where sums[i] is the sum of values in group keys[i]
+    """
+    keys, inverse = np.unique(np.asarray(groups), return_inverse=True)
+    sums = np.zeros((len(keys),) + values.shape[1:])
+    np.add.at(sums, inverse, values)
+    return keys, sums
+
+
+def axialGradient(masses, types) -> np.ndarray:
+    """
+    The slug-to-slug axial gradient in g/cm, shape (positions, slugs - 1, nuclides)
+    """
+    heights = np.array([SLUG_GEOMETRY.get(baseType(label), (0, 0., 1.))[2] for label in types])
+    return np.diff(masses, axis=1) / heights[:, None, None]
+
+
+def inventory(compact, types, nuclides=('U235', 'U238', 'Pu'), by='assembly') -> pd.DataFrame:
+    """
+    The whole-core inventory as a tidy table
+
+    Input
+    -----
+    compact: CompactLattice, with the slug densities
+    types: ArrayLike, the type of assembly at every position
+    nuclides: ArrayLike, see selectZaids()
+    by: str, 'assembly', 'ring', 'type' or 'slug'
+
+    Return
+    ------
+    DataFrame with columns (key, nuclide, mass) in g, where key is the location, ring or type,
+    and also slug if by 'slug'
+    """
+    masses = slugMasses(compact, types, nuclides)
+    rk = positions(compact.ringNum)
+    locs = locations(compact.ringNum)
+
+    if by == 'slug':
+        frame = pd.DataFrame({
+            'key': np.repeat(locs, masses.shape[1] * len(nuclides)),
+            'slug': np.tile(np.repeat(np.arange(1, masses.shape[1] + 1), len(nuclides)), len(locs)),
+            'nuclide': np.tile(np.asarray(nuclides, dtype=str), len(locs) * masses.shape[1]),
+            'mass': masses.reshape(-1)
+        })
+        return frame[frame['mass'] > 0].reset_index(drop=True)
+
+    totals = masses.sum(axis=1) # (positions, nuclides)
+    if by == 'assembly':
+        keys, sums = locs, totals
+    elif by == 'ring':
+        keys, sums = reduce(totals, rk[:, 0] + 1)
+    elif by == 'type':
+        keys, sums = reduce(totals, [baseType(label) for label in types])
+    else:
+        raise ValueError("Inventory by {} is NOT supported.".format(by))
+
+    frame = pd.DataFrame({
+        'key': np.repeat(keys, len(nuclides)),
+        'nuclide': np.tile(np.asarray(nuclides, dtype=str), len(keys)),
+        'mass': sums.reshape(-1)
+    })
+    return frame[frame['mass'] > 0].reset_index(drop=True)
+
+
+def plotInventory(compact, types, nuclide, savePath, **kwargs):
+    """
+    Plot the mass of a nuclide in every assembly as a core map, see plotting.plotRadial()
+    """
+    from plotting import plotRadial # matplotlib is imported only for plots
+
+    masses = slugMasses(compact, types, (nuclide,)).sum(axis=(1, 2))
+    return plotRadial(compact.toNested(), savePath, values=masses, title='{} mass (g)'.format(nuclide), **kwargs)
@@ -11,6 +11,10 @@ File Log:
             A simple test passed
 2023-1-28   blankAssemb, mapLocType() completed
 2023-1-29   buildDrivers() completed
+2026-10-19  buildSlugs(), locateAssemb() split out for incremental rebuild
+2026-10-19  shiftAssemb(), shiftLattice() to move rods axially
+2026-10-19  buildAvgSlug() of selected assemblies
+2026-10-19  Slug sections shared through sectionCache
 """
 import os
 import sys
@@ -23,8 +27,16 @@ PYSARAX_PATH = {
 }
 sys.path.append(PYSARAX_PATH[getuser()])
 
+from functools import lru_cache
+
 from pySARAX import Assembly, Assemblies
 from sections import *
+from analytics import slugVolumes
+from sectioncache import SectionCache
+
+# The cache of slug sections on disk, NOT used if None
+# Enable it like `assemblies.sectionCache = SectionCache('./output/sections')`
+sectionCache = None
 
 
 # Auxiliary function to get sections from list according to their keys
@@ -37,6 +49,81 @@ def getSecs(secs, keys):
             result.append(key)
     return result
 
+# ###################################################
+#                  Reference Plane
+# 
+# The reference planes are recorded to move rods axially
+# without rebuilding their sections
+# ###################################################
+def setRefPlane(assembly, idx, offset=0.):
+    """
+    Set the reference plane of assembly, and record it for shiftAssemb()
+
+    Input
+    -----
+    assembly: Assembly
+    idx: int, the index of section, whose lower bound is the reference plane
+    offset: float, the axial coordinate of reference plane
+    """
+    assembly.setRefPlane(idx, offset)
+    assembly.nominalRefPlane = (idx, offset)
+    assembly.axialShift = 0.
+
+
+def shiftAssemb(assembly, shift):
+    """
+    Shift the assembly axially from its nominal position, like moving a control rod
+
+    The existing sections are reused without being rebuilt. But the sections shared with
+    other assemblies are copied at the first shift, since they carry the axial coordinates.
+
+    pySARAX can NOT move an assembly in a built core, so every shifted position still needs
+    a full buildCore(), i.e. Core.complete() & Core.meshing() of the whole core, and new cards.
+    A positional scan saves only the building of slug sections, NOT the core build per position.
+
+    Input
+    -----
+    assembly: Assembly, built by buildAssemb()
+    shift: float, the axial shift in cm from the nominal position, positive upward
+    """
+    if not hasattr(assembly, 'nominalRefPlane'):
+        raise ValueError("Assembly {} has NO recorded reference plane to shift.".format(assembly))
+
+    if not getattr(assembly, 'detached', False):
+        assembly.originals = list(assembly.sections) # The shared sections copied from
+        assembly.sections = [sec.copy(name=sec.name) for sec in assembly.sections]
+        assembly.detached = True
+
+    idx, offset = assembly.nominalRefPlane
+    assembly.setRefPlane(idx, offset + shift)
+    assembly.axialShift = shift
+
+
+def shiftLattice(lattice, shifts) -> list:
+    """
+    Shift the assemblies in lattice by location
+
+    Input
+    -----
+    lattice: list, the core lattice
+    shifts: dict, location -> axial shift in cm, like {'05C03': -10.0}
+
+    Return
+    ------
+    A list of locations whose shift changed. The whole core is still built again,
+    see shiftAssemb(), and divider.divide(..., incremental=True) rewrites only the batches changed.
+    """
+    changed = []
+    for location, shift in shifts.items():
+        r, k = slugmat.convertLocation(location)
+        assembly = lattice[r][k]
+        if getattr(assembly, 'axialShift', 0.) != shift:
+            shiftAssemb(assembly, shift)
+            changed.append(location)
+
+    return changed
+
+
 # ###################################################
 #          Assemblies without fuel slug
 # ###################################################
@@ -48,7 +135,7 @@ assembNoFuel['reflector'].sections = getSecs(
     reflectorSecs,
     ['lowAdp', 'lowAssemblyPlug', 'reflectorSlug', 'upAssemblyPlug']
 )
-assembNoFuel['reflector'].setRefPlane(2, 62.548) # Ref P103 Item:A
+setRefPlane(assembNoFuel['reflector'], 2, 62.548) # Ref P103 Item:A
 
 # Dummy
 assembNoFuel['dummy'] = Assembly(typeName='dummy', location=location)
@@ -56,7 +143,7 @@ assembNoFuel['dummy'].sections = getSecs(
     dummySecs,
     ['lowAdp', 'lowAssemblyPlug', 'dummyElement', 'sodiumAboveRod', 'upAssemblyPlug']
 )
-assembNoFuel['dummy'].setRefPlane(2, 62.5475) # Ref P92 Item:A
+setRefPlane(assembNoFuel['dummy'], 2, 62.5475) # Ref P92 Item:A
 
 # X320C
 assembNoFuel['X320C'] = Assembly(typeName='experimental', location=location)
@@ -64,54 +151,86 @@ assembNoFuel['X320C'].sections = getSecs(
     dummySecs,
     ['lowAdp', 'lowAssemblyPlug', 'dummyElement', 'sodiumAboveRod', 'upAssemblyPlug']
 )
-assembNoFuel['X320C'].setRefPlane(2, 62.5475) # Ref P92 Item:A
+setRefPlane(assembNoFuel['X320C'], 2, 62.5475) # Ref P92 Item:A
 
 
 # ###################################################
 #                      Build Function
 # ###################################################
-def buildAssemb(assemblyType, location, MKType='MKII') -> Assembly:
+def experimentalType(location) -> str:
     """
-    Build the assembly at given location
+    Get the type of experimental assembly at given location
+    """
+    if location == '04C02': # Identifier: C2776A
+        return 'C2776A'
+    elif location == '04D02':
+        return 'X320C'
+    elif location == '05C01':
+        return 'XX10'
+    elif location == '05D03':
+        return 'XX09'
+    elif location == '05F03':
+        return 'XY-16'
+    elif location == '06B03': # Identifier: X402A
+        return 'X402A'
+    elif location == '06D01': # Identifier: X412
+        return 'X412'
+    else:
+        raise ValueError("No experimental assembly at location [{}]".format(location))
+
+
+# Assembly types without fuel slug
+noSlugTypes = ('dummy', 'reflector', 'blank', 'X320C', 'XX10', 'XY-16')
+
+
+def buildSlugs(assemblyType, location) -> tuple:
+    """
+    Build the slug sections of assembly at given location from its CSV material file
 
     Input
     -----
     assemblyType: str, the type name of assembly, like 'driver'
     location: str, the location of assembly, like '01A01'
-    MKType: str, 'MKII' or 'MKIIA'
+
+    Return
+    ------
+    A tuple of slug sections, or None if the assembly has NO fuel slug
     """
-    # Pre-processing of experimental assembly
     if assemblyType == 'experimental':
-        if location == '04C02': # Identifier: C2776A
-            assemblyType = 'C2776A'
-        elif location == '04D02':
-            assemblyType = 'X320C'
-        elif location == '05C01':
-            assemblyType = 'XX10'
-        elif location == '05D03':
-            assemblyType = 'XX09'
-        elif location == '05F03':
-            assemblyType = 'XY-16'
-        elif location == '06B03': # Identifier: X402A
-            assemblyType = 'X402A'
-        elif location == '06D01': # Identifier: X412
-            assemblyType = 'X412'
-        else:
-            raise ValueError("No experimental assembly at location [{}]".format(location))
+        assemblyType = experimentalType(location)
 
     # Find the slug materials at given location
     try:
         if location == 'test':
-            slugSecs = (avgFuelSlug.copy(name='Slug{:d}'.format(idx)) for idx in range(1, 4))
-        elif assemblyType in ('dummy', 'reflector', 'blank', 'X320C', 'XX10', 'XY-16'):
-            pass
+            return tuple(avgFuelSlug().copy(name='Slug{:d}'.format(idx)) for idx in range(1, 4))
+        elif assemblyType in noSlugTypes:
+            return None
+        elif sectionCache is not None:
+            return sectionCache.build(location, assemblyType, fuelSlugs.get(location))
         else:
-            slugSecs = buildSec(location, assemblyType, slugmat.get(location))
+            return buildSec(location, assemblyType, fuelSlugs.get(location))
     except FileNotFoundError as err:
         raise RuntimeError("There is NO {} assembly at [{}]".format(assemblyType, location)) from err
-    except UnboundLocalError as err:
-        print("Error: ({}, {})".format(location, assemblyType))
-        raise err
+
+
+def buildAssemb(assemblyType, location, MKType='MKII', slugSecs=None) -> Assembly:
+    """
+    Build the assembly at given location
+
+    Input
+    -----
+    assemblyType: str, the type name of assembly, like 'driver'
+    location: str, the location of assembly, like '01A01'
+    MKType: str, 'MKII' or 'MKIIA'
+    slugSecs: tuple, the slug sections built before by buildSlugs(), which are built here if None
+    """
+    # Pre-processing of experimental assembly
+    if assemblyType == 'experimental':
+        assemblyType = experimentalType(location)
+
+    # Find the slug materials at given location
+    if slugSecs is None:
+        slugSecs = buildSlugs(assemblyType, location)
 
     # Build assembly from sections
     if assemblyType in ('driver', 'HWD', 'C2776A', 'X402A', 'X412'):
@@ -121,7 +240,7 @@ def buildAssemb(assemblyType, location, MKType='MKII') -> Assembly:
             driverSecs,
             ['lowAdp', 'lowAssemblyPlug', 'lowEx', 'lowCladPlug', *slugSecs, 'sodiumAboveSlug-{}'.format(MKType), 'gasPlenum-{}'.format(MKType), 'upCladPlug-{}'.format(MKType), 'sodiumAboveRod-{}'.format(MKType), 'upEx-{}'.format(MKType), 'upAssemblyPlug-{}'.format(MKType)]
         )
-        assembly.setRefPlane(3) # Set lowCladPlug as ref plane
+        setRefPlane(assembly, 3) # Set lowCladPlug as ref plane
     
     elif assemblyType == 'control':
         assemblyType = '-'.join((assemblyType, MKType))
@@ -130,7 +249,7 @@ def buildAssemb(assemblyType, location, MKType='MKII') -> Assembly:
             controlSecs,
             ['lowAssemblyPlug', 'lowSodiumGap', 'lowAdp-narrow', 'lowAdp-trans', 'lowAdp-wide', 'medianAssemblyPlug', 'lowCladPlug', *slugSecs, 'sodiumAboveRod', 'gasPlenum', 'upCladPlug', 'medianSodiumGap', 'upEx-low', 'upEx-high']
         )
-        assembly.setRefPlane(7, 0.635 - 0.3175) # Ref P96 Item:F
+        setRefPlane(assembly, 7, 0.635 - 0.3175) # Ref P96 Item:F
 
     elif assemblyType == 'safety':
         assemblyType = '-'.join((assemblyType, MKType))
@@ -139,7 +258,7 @@ def buildAssemb(assemblyType, location, MKType='MKII') -> Assembly:
             safetySecs,
             ['lowAssemblyPlug', 'lowSodiumGap', 'lowAdp-narrow', 'lowAdp-trans', 'lowAdp-wide', 'medianAssemblyPlug', 'lowCladPlug', *slugSecs, 'sodiumAboveRod', 'gasPlenum', 'upCladPlug', 'upSodiumGap', 'upEx', 'upAssemblyPlug']
         )
-        assembly.setRefPlane(7, 0.635 - 0.3175)
+        setRefPlane(assembly, 7, 0.635 - 0.3175)
 
     elif assemblyType == 'HWCR':
         assemblyType = '-'.join((assemblyType, MKType))
@@ -148,7 +267,7 @@ def buildAssemb(assemblyType, location, MKType='MKII') -> Assembly:
             hwcrSecs,
             ['lowAssemblyPlug', 'lowSodiumGap', 'lowAdp-wide', 'medianAssemblyPlug', 'lowCladPlug', *slugSecs, 'sodiumAboveRod', 'gasPlenum', 'upCladPlug', 'medianSodiumGap', 'poisonPlug-low', 'poisonSlug', 'poisonSodiumGap', 'poisonShieldBlock', 'poisonGasPlenum', 'upSodiumGap', 'upAssemblyPlug']
         )
-        assembly.setRefPlane(5, 8.255 - 0.3175)
+        setRefPlane(assembly, 5, 8.255 - 0.3175)
 
     elif assemblyType == 'blanket':
         assembly = Assembly(typeName=assemblyType, location=location)
@@ -156,7 +275,7 @@ def buildAssemb(assemblyType, location, MKType='MKII') -> Assembly:
             blanketSecs,
             ['lowAdp', 'lowAssemblyPlug', *slugSecs, 'sodiumAboveRod', 'gasPlenum', 'sodiumGap', 'upAssemblyPlug']
         )
-        assembly.setRefPlane(3, 62.5475 - blanketSecs['lowAssemblyPlug'].height - 46.567) # Ref P108 Item:A
+        setRefPlane(assembly, 3, 62.5475 - blanketSecs['lowAssemblyPlug'].height - 46.567) # Ref P108 Item:A
 
     # elif assemblyType in ('dummy', 'X320C'):
     #     assembly = Assembly(typeName=assemblyType, location=location)
@@ -181,7 +300,7 @@ def buildAssemb(assemblyType, location, MKType='MKII') -> Assembly:
             xx10Secs,
             ['lowAssemblyPlug', 'lowSodiumGap-narrow', 'lowSodiumGap-trans', 'lowSodiumGap-wide', 'lowEx', 'element', 'upSodiumGap', 'upEx', 'upAssemblyPlug']
         )
-        assembly.setRefPlane(5)
+        setRefPlane(assembly, 5)
 
     elif assemblyType == 'XX09':
         assembly = Assembly(typeName=assemblyType, location=location)
@@ -189,7 +308,7 @@ def buildAssemb(assemblyType, location, MKType='MKII') -> Assembly:
             xx09Secs,
             ['lowAssemblyPlug', 'lowSodiumGap-narrow', 'lowSodiumGap-trans', 'lowSodiumGap-wide', 'lowEx', *slugSecs, 'sodiumAboveRod', 'gasPlenum', 'upSodiumGap', 'upEx', 'upAssemblyPlug']
         )
-        assembly.setRefPlane(5)
+        setRefPlane(assembly, 5)
 
     elif assemblyType == 'XY-16':
         # assemblyType = '-'.join((assemblyType, MKType))
@@ -200,7 +319,7 @@ def buildAssemb(assemblyType, location, MKType='MKII') -> Assembly:
             xy16Secs,
             ['lowAssemblyPlug', 'lowSodiumGap', 'lowAdp-narrow', 'lowAdp-trans', 'lowAdp-wide', 'medianAssemblyPlug', 'lowCladPlug', element, 'sodiumAboveRod', 'gasPlenum', 'upCladPlug', 'medianSodiumGap', 'upEx-low', 'upEx-high']
         )
-        assembly.setRefPlane(7, 0.635 - 0.3175)
+        setRefPlane(assembly, 7, 0.635 - 0.3175)
     
     elif assemblyType == 'blank':
         assembly = blankAssemb
@@ -225,6 +344,7 @@ drivers = {}
 # ###################################################
 blankAssemb = Assembly(typeName='blank', location='00X00')
 blankAssemb.addSection(blankSec, bounds=(-145.188, 143.683))
+blankAssemb.fixedBounds = (-145.188, 143.683) # Recorded for mesh.axialBounds()
 
 
 # ###################################################
@@ -261,6 +381,39 @@ halfWorthDrivers = (1, 2, 4, 6, 9, 11, 13, 17, 66, 75, 79, 90, 120)
 # The numbers of assemblies without CSV material file: all reflectors &
 assembNoCsv = (24, 38, 52)
 
+def locateAssemb(position) -> tuple:
+    """
+    Map the position in core lattice to the location & type of assembly
+
+    Input
+    -----
+    position: tuple, (r, k) in core lattice
+
+    Return
+    ------
+    (location, assemblyType, MKType), like ('01A01', 'driver', 'MKII')
+    """
+    MKType = 'MKII'
+    location = slugmat.convertLocation(position)
+    targetAssemb = assembLoc[assembLoc['Location'] == location]
+
+    # Fill the blank location at margin
+    if targetAssemb.empty:
+        assemblyType = 'blank'
+    else:
+        assemblyType = typeNameTable[targetAssemb['Type'].item()]
+
+    # Rename the driver
+    if 'MK' in assemblyType and int(targetAssemb['Number']) in halfWorthDrivers:
+        assemblyType = 'HWD'
+    elif assemblyType == 'MKII':
+        assemblyType = 'driver'
+    elif assemblyType == 'MKIIA':
+        assemblyType = 'driver'
+        MKType = 'MKIIA'
+
+    return location, assemblyType, MKType
+
 # def mapLocType(location):
 #     """
 #     Map location to assembly type
@@ -274,3 +427,69 @@ assembNoCsv = (24, 38, 52)
 #     >>> mapLocType('01A01')
 #     'driver-MKII'
 #     """
+
+
+# ###################################################
+#                  Average Fuel Slug
+# 
+# The slug densities of selected assemblies are averaged by the volume of fuel
+# on the shared ZAID index of fuelSlugs, where a nuclide missing in a slug counts as 0,
+# so that NO NaN comes from the misaligned nuclides (see note.txt 2023-3-12)
+# ###################################################
+def buildAvgSlug(selection=None, secType='driver', name='average') -> Section:
+    """
+    Build the slug section with the volume-weighted average composition of selected assemblies
+
+    Input
+    -----
+    selection: the assemblies to average, any of
+        None, the assemblies of secType
+        str, a type of assembly, like 'HWD'
+        ArrayLike, the locations or types, like ('01A01', '02C01') or ('driver', 'HWD')
+        callable, (location, assemblyType, MKType) -> bool, like lambda loc, typ, mk: loc[:2] == '03'
+    secType: str, the geometry of slug section, see buildSec()
+    name: str, the name of section, like 'average driver slug1'
+
+    Example
+    -------
+    ```python
+    >>> avgMKII = buildAvgSlug(lambda loc, typ, mk: typ == 'driver' and mk == 'MKII', name='average MKII')
+    ```
+    """
+    if selection is None:
+        selection = secType
+    if type(selection) is str:
+        selection = (selection,)
+    if not callable(selection):
+        targets = set(selection)
+        selection = lambda location, assemblyType, MKType: location in targets or assemblyType in targets
+
+    # Weight every slug by the volume of fuel in it
+    weights = dict()
+    for location in list(fuelSlugs.types):
+        location, assemblyType, MKType = locateAssemb(slugmat.convertLocation(location))
+        if assemblyType == 'experimental':
+            assemblyType = experimentalType(location)
+        if selection(location, assemblyType, MKType):
+            weights[location] = slugVolumes([assemblyType])[0]
+
+    total = fuelSlugs.mix(weights)
+    slugNums = {location: fuelSlugs.data[location][1].shape[1] for location in weights}
+    totalWeight = sum(weight * slugNums[location] for location, weight in weights.items())
+    slugNum = sum(slugNums.values())
+
+    if totalWeight == 0.:
+        raise ValueError("NO fuel slug is selected to average.")
+
+    average = fuelSlugs.toDataFrame(total / totalWeight)
+
+    print("Average slug [{}] of {:d} slugs built.".format(name, slugNum))
+    return buildSec(name, secType, (average,) * 3)[0]
+
+
+@lru_cache(maxsize=None)
+def avgFuelSlug() -> Section:
+    """
+    The average slug of all drivers for the 'test' location, built at the first call
+    """
+    return buildAvgSlug(secType='driver', name='average fuel')
@@ -0,0 +1,276 @@
+"""
+In-memory model of TULIP input card
+
+A TULIP card consists of a header and three parts:
+```
+header
+CONTROL:
+keyword (22 columns)  value
+GEOMETRY:
+geometry block of mat1
+
+
+geometry block of mat2
+MATERIAL:
+material block
+
+
+material block
+```
+TulipCard parses the CONTROL entries, indexes the geometry blocks by material ID
+and the material blocks by name, while keeping every piece of the original text,
+so that str(card) reproduces the input byte by byte.
+"""
+import os
+import gzip
+import hashlib
+
+
+# ###################################################
+#                       CONTROL
+# ###################################################
+class ControlCard:
+
+    def __init__(self, text) -> None:
+        """
+        The CONTROL entries, indexed by keyword
+
+        Every line is kept as it is, and only the modified entries are re-formatted.
+        """
+        self.lines = text.split('\n')
+        self.index = dict()
+        for idx, line in enumerate(self.lines):
+            if ' ' not in line or '!' in line:
+                continue
+            self.index[line[:22].rstrip(' ')] = idx
+
+    def __getitem__(self, keyword) -> str:
+        return self.lines[self.index[keyword]][22:]
+
+    def __setitem__(self, keyword, value):
+        line = '{:<22}{}'.format(keyword, value)
+        if keyword in self.index:
+            self.lines[self.index[keyword]] = line
+        else:
+            self.index[keyword] = len(self.lines)
+            self.lines.append(line)
+
+    def __contains__(self, keyword) -> bool:
+        return keyword in self.index
+
+    def keys(self):
+        return self.index.keys()
+
+    def items(self):
+        return ((keyword, self[keyword]) for keyword in self.index)
+
+    def toDict(self) -> dict:
+        """
+        Convert the entries to dict, like the one from divider.control2dict()
+        """
+        return dict(self.items())
+
+    def __str__(self) -> str:
+        return '\n'.join(self.lines)
+
+
+# ###################################################
+#                      GEOMETRY
+# ###################################################
+class GeomBlock:
+
+    def __init__(self, text) -> None:
+        """
+        A geometry block, whose lines containing 'mat' (but NOT '_') are its material tag, like 'mat12'
+        """
+        self.text = text
+        self.lines = text.split('\n')
+        self.matLines = [idx for idx, line in enumerate(self.lines) if 'mat' in line and '_' not in line]
+        self.matId = None
+        for idx in self.matLines:
+            tag = self.lines[idx].strip()
+            if tag[3:].isdigit():
+                self.matId = int(tag[3:])
+                break
+        self._canonical = None
+        self._digest = None
+        self._words = None
+
+    @property
+    def isBlock(self) -> bool:
+        return len(self.matLines) > 0
+
+    @property
+    def canonical(self) -> str:
+        """
+        The text without material number, so that blocks differing only in 'mat' are identical
+
+        The surrounding newlines are stripped, like the '\n' after 'GEOMETRY:' before the first block,
+        while the text of block is kept as it is for output.
+        """
+        if self._canonical is None:
+            self._canonical = self.renumber(None).strip('\n')
+        return self._canonical
+
+    @property
+    def digest(self) -> str:
+        """
+        The SHA1 of canonical text
+        """
+        if self._digest is None:
+            self._digest = hashlib.sha1(self.canonical.encode('utf-8')).hexdigest()
+        return self._digest
+
+    @property
+    def words(self) -> frozenset:
+        if self._words is None:
+            self._words = frozenset(self.canonical.split())
+        return self._words
+
+    def renumber(self, newId) -> str:
+        """
+        Get the text of block with its material tag replaced by 'mat{newId}'
+        """
+        tag = 'mat' if newId is None else 'mat{:d}'.format(newId)
+        lines = list(self.lines)
+        for idx in self.matLines:
+            lines[idx] = tag
+        return '\n'.join(lines)
+
+    def __str__(self) -> str:
+        return self.text
+
+
+# ###################################################
+#                      MATERIAL
+# ###################################################
+class MatBlock:
+
+    def __init__(self, text) -> None:
+        """
+        A material block, whose first word is its name
+        """
+        self.text = text
+        self.name = text.split()[0] if text.strip() else None
+
+    def __str__(self) -> str:
+        return self.text
+
+
+# ###################################################
+#                        Card
+# ###################################################
+class TulipCard:
+
+    GEOM_SEP = '\n\n\n'
+    MAT_SEP = '\n\n'
+
+    def __init__(self, header, control, geometry, materials) -> None:
+        """
+        Input
+        -----
+        header: str, the text before 'CONTROL:'
+        control: ControlCard
+        geometry: list, the GeomBlock pieces of the geometry text
+        materials: list, the MatBlock pieces of the material text
+        """
+        self.header = header
+        self.control = control
+        self.geomPieces = geometry
+        self.matPieces = materials
+
+        # The pieces without material tag (like the blank tail) are NOT geometry blocks
+        self.geometry = [block for block in geometry if block.isBlock]
+        self.geomIndex = {block.matId: block for block in self.geometry}
+        self.materials = {block.name: block for block in materials if block.name is not None}
+
+    @classmethod
+    def parse(cls, text):
+        """
+        Parse the text of TULIP card
+        """
+        for keyword in ('CONTROL:', 'GEOMETRY:', 'MATERIAL:'):
+            if text.count(keyword) != 1:
+                raise ValueError("Keyword {} should appear once in TULIP card.".format(keyword))
+
+        header, remains = text.split('CONTROL:')
+        control, remains = remains.split('GEOMETRY:')
+        geometry, materials = remains.split('MATERIAL:')
+
+        return cls(
+            header=header,
+            control=ControlCard(control),
+            geometry=[GeomBlock(piece) for piece in geometry.split(cls.GEOM_SEP)],
+            materials=[MatBlock(piece) for piece in materials.split(cls.MAT_SEP)]
+        )
+
+    @classmethod
+    def read(cls, path):
+        """
+        Read the card from path, which is decompressed by gzip if it ends with '.gz'
+        """
+        if path.endswith('.gz'):
+            with gzip.open(path, 'rt', encoding='utf-8', newline='') as f:
+                return cls.parse(f.read())
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            return cls.parse(f.read())
+
+    @property
+    def geomText(self) -> str:
+        return self.GEOM_SEP.join(block.text for block in self.geomPieces)
+
+    @property
+    def matText(self) -> str:
+        return self.MAT_SEP.join(block.text for block in self.matPieces)
+
+    def __str__(self) -> str:
+        return ''.join((self.header, 'CONTROL:', str(self.control), 'GEOMETRY:', self.geomText, 'MATERIAL:', self.matText))
+
+    def write(self, path):
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            for piece in (self.header, 'CONTROL:', str(self.control), 'GEOMETRY:', self.geomText, 'MATERIAL:', self.matText):
+                f.write(piece)
+
+    def batch(self, startId, endId) -> list:
+        """
+        Get the geometry blocks from startId to endId (both included, starting from 1)
+        """
+        return self.geometry[startId-1:endId]
+
+    def referredMaterials(self, block) -> list:
+        """
+        Get the names of materials referred by a geometry block, or anything with its words
+        """
+        return sorted(name for name in self.materials if name in block.words)
+
+    def diff(self, other) -> dict:
+        """
+        Compare with another card
+
+        Return
+        ------
+        A dict containing the keywords, material IDs & material names changed in other card,
+        like {'control': ['n_mat'], 'geometry': [12, 13], 'materials': ['fuel1']}
+        """
+        keywords = set(self.control.keys()) | set(other.control.keys())
+        geomIds = set(self.geomIndex.keys()) | set(other.geomIndex.keys())
+        names = set(self.materials.keys()) | set(other.materials.keys())
+
+        def text(index, key):
+            return index[key].text if key in index else None
+
+        return {
+            'control': sorted(k for k in keywords if (self.control[k] if k in self.control else None) != (other.control[k] if k in other.control else None)),
+            'geometry': sorted(k for k in geomIds if text(self.geomIndex, k) != text(other.geomIndex, k)),
+            'materials': sorted(k for k in names if text(self.materials, k) != text(other.materials, k))
+        }
+
+
+if __name__ == '__main__':
+    import sys
+    path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.getcwd(), 'output', 'TPmate.inp')
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        text = f.read()
+    card = TulipCard.parse(text)
+    assert str(card) == text, "Round trip of {} failed.".format(path)
+    print("{}: {:d} geometry blocks, {:d} materials".format(path, len(card.geometry), len(card.materials)))
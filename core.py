@@ -8,6 +8,15 @@ Project: Verification of LoongSARAX Program
 File Log:
 2023-1-26   File created
 2023-1-28   Basic structure created
+2026-10-19  Input cards written part by part
+2026-10-19  Incremental rebuild of lattice by LatticeBuilder
+2026-10-19  buildCore() split out for sweeps
+2026-10-19  Axial mesh estimated in advance by AxialMesh
+2026-10-19  Meshing tolerance estimated by AxialMesh.adapt()
+2026-10-19  Supercells of HWCR from real neighbors
+2026-10-19  Batched plotting in background
+2026-10-19  Memory-bounded build by buildLowMemory()
+2026-10-19  Slug sections cached on disk by SectionCache
 """
 import os
 import sys
@@ -23,13 +32,17 @@ sys.path.append(PYSARAX_PATH[getuser()])
 import pandas as pd
 from pySARAX import Core
 from assemblies import *
+from output import writeTULIP, writeLAVENDER, iterCard
+from divider import divideStream
+from rebuild import LatticeBuilder
+from mesh import AxialMesh
+from supercell import buildSupercells
+from plotting import plotRadial, plotAxial
+from memory import MemoryTracker
 
 # ###################################################
 #                  Auxiliary Function
 # ###################################################
-assembLocPath = "C:\SJTUGraduate\Research\Projects\LoongSARAXVerif\code\model_ver2\\assembLocations.xlsx"
-assembLoc = pd.read_excel(assembLocPath)
-
 def buildLattice() -> list:
     """
     Build the core lattice of EBR-II
@@ -40,28 +53,8 @@ def buildLattice() -> list:
     for r in range(16):
         ring = []
         for k in range(assembNum(r)):
-            MKType = 'MKII'
-            location = slugmat.convertLocation((r, k))
-            targetAssemb = assembLoc[assembLoc['Location'] == location]
-
-            # Fill the blank location at margin
-            if targetAssemb.empty:
-                assembType = 'blank'
-            else:
-                assembType = typeNameTable[targetAssemb['Type'].item()]
-
-            # Rename the driver
-            if 'MK' in assembType and int(targetAssemb['Number']) in halfWorthDrivers:
-                assembType = 'HWD'
-            elif assembType == 'MKII':
-                assembType = 'driver'
-            elif assembType == 'MKIIA':
-                assembType = 'driver'
-                MKType = 'MKIIA'
-            
+            location, assembType, MKType = locateAssemb((r, k))
             assembly = buildAssemb(assembType, location, MKType)
-            if assembType == 'Safeties':
-                print(r, k, location, targetAssemb)
             ring.append(assembly)
             print("Assembly [{}, {}, {}] created.".format((r+1, k+1), location, assembType))
 
@@ -74,39 +67,136 @@ def buildLattice() -> list:
 # ###################################################
 #                        Core
 # ###################################################
-core = Core(name='EBR-II', ring=16, pitch=5.8929, coolant=blankSec)
+def buildCore(lattice, power=62.5E6, gammaHeat=True, boundaryConditions=(0, 0), tolerance=0.1000) -> Core:
+    """
+    Build the core of EBR-II from lattice, then complete & mesh it
+
+    Input
+    -----
+    lattice: list, the core lattice from buildLattice()
+    power: float, the thermal power in W
+    gammaHeat: bool, whether to consider the gamma heating
+    boundaryConditions: tuple, the axial boundary conditions, 0: vacuum, 1: reflect
+    tolerance: float, the tolerance of axial meshing
+    """
+    core = Core(name='EBR-II', ring=16, pitch=5.8929, coolant=blankSec)
+    core.lattice = lattice
+
+    # Control Parameters
+    core.power = power # Wth
+    core.gammaHeat = gammaHeat
+    core.boundaryConditions = boundaryConditions # 0: vacuum, 1: reflect
+
+    # Meshing
+    core.complete()
+    core.meshing(tolerance=tolerance)
+
+    return core
+
+
+def buildLowMemory(outputDir, memoryCap=None, jobName=None, batchSize=50, **params) -> MemoryTracker:
+    """
+    Build the core & write its cards holding as little as possible at the same time
+
+    The densities of every location are released as soon as its slug sections are built,
+    the lattice is referred to only by the core, and each card is written part by part to
+    file (or to divider) and dropped before the next one is generated. pySARAX still builds
+    every card as a whole string, see output.py.
+
+    Input
+    -----
+    outputDir: str, the directory of input cards
+    memoryCap: float, the memory cap in MB to report against, see memory.MemoryTracker
+    jobName: str, the TULIP card is handed to divider.divideStream() if given, otherwise written to TPmate.inp.gz
+    batchSize: int, the number of geometry blocks per batch of divider
+    params: the keyword arguments of buildCore()
+
+    Return
+    ------
+    The MemoryTracker with the memory of every phase
+    """
+    tracker = MemoryTracker(cap=memoryCap)
+    releaseAfterUse = fuelSlugs.releaseAfterUse
+    fuelSlugs.releaseAfterUse = True
+    os.makedirs(outputDir, exist_ok=True)
+
+    try:
+        with tracker.phase('lattice'):
+            lattice = buildLattice()
+        with tracker.phase('core'):
+            core = buildCore(lattice, **params)
+            del lattice
+
+        with tracker.phase('TULIP'):
+            if jobName is not None:
+                divideStream(jobName=jobName, parts=iterCard(core.toTULIP()), batchSize=batchSize)
+            else:
+                writeTULIP(core, os.path.join(outputDir, 'TPmate.inp.gz'))
+        with tracker.phase('LAVENDER'):
+            writeLAVENDER(core, os.path.join(outputDir, 'lavender.inp.gz'))
+    finally:
+        # Restored for the builds after this one
+        fuelSlugs.releaseAfterUse = releaseAfterUse
+        tracker.stop()
+
+    tracker.report()
+
+    return tracker
+
+
+if __name__ == '__main__':
+    # Lattice Geometry & Materials
+    # lattice = [
+    #     [buildAssemb('dummy', '05C03', 'MKIIA')],
+    #     [drivers['test-MKIIA'].copy(typeName='driver-MKIIA', location='test') for _ in range(6)],
+    #     [blankAssemb for _ in range(12)]
+    # ]
+
+    # The slug sections could be shared on disk by repeated builds & parallel workers, see sectioncache.py
+    # import assemblies
+    # assemblies.sectionCache = SectionCache(os.path.join(os.getcwd(), 'output', 'sections'), maxBytes=2 << 30)
+
+    lattice = buildLattice()
+
+    # Or rebuild only the assemblies whose CSV material files changed since the last run
+    # builder = LatticeBuilder()
+    # lattice = builder.build()
+
+    # Surround the poison slug of every HWCR by its real neighbors, see supercell.py
+    # buildSupercells(lattice)
+
+    # The axial mesh of Core.meshing() could be estimated in advance, see mesh.py
+    # print(AxialMesh(lattice, tolerance=0.1000))
 
-# Lattice Geometry & Materials
-# core.lattice = [
-#     [buildAssemb('dummy', '05C03', 'MKIIA')],
-#     [drivers['test-MKIIA'].copy(typeName='driver-MKIIA', location='test') for _ in range(6)],
-#     [blankAssemb for _ in range(12)]
-# ]
+    # Or estimate the tolerance for a maximum number of meshes and/or a maximum boundary shift,
+    # then compare the estimated count with the meshes of the built core
+    # tolerance = AxialMesh(lattice).adapt(maxCount=80, maxShift=0.5)['tolerance']
 
-core.lattice = buildLattice()
+    core = buildCore(lattice, power=62.5E6, gammaHeat=True, boundaryConditions=(0, 0), tolerance=0.1000)
 
-# Control Parameters
-core.power = 62.5E6 # Wth
-core.gammaHeat = True
-core.boundaryConditions = (0, 0) # 0: vacuum, 1: reflect
+    # Plot
+    cwd = os.getcwd()
+    core.plotRaial(savePath=os.path.join(cwd, 'output', 'radial.svg'))
+    core.plotAxial(savePath=os.path.join(cwd, 'output', 'axial.svg'))
 
-# Meshing & Ploting
-core.complete()
+    # Or draw them as batched collections in raster by a background process, see plotting.py
+    # radialPlot = plotRadial(lattice, os.path.join(cwd, 'output', 'radial.png'), background=True)
+    # axialPlot = plotAxial(lattice, os.path.join(cwd, 'output', 'axial.png'), background=True)
 
-core.meshing(tolerance=0.1000)
+    # Generate Input Cards
+    cwd = os.getcwd()
+    tulipPath = os.path.join(cwd, 'output', "TPmate.inp")
+    lavenderPath = os.path.join(cwd, 'output', "lavender.inp")
 
-# Plot
-cwd = os.getcwd()
-core.plotRaial(savePath=os.path.join(cwd, 'output', 'radial.svg'))
-core.plotAxial(savePath=os.path.join(cwd, 'output', 'axial.svg'))
+    # Cards are written part by part without further copies, and compressed by gzip if the path ends with '.gz'
+    # pySARAX still builds every card as a whole string, see output.py
+    # writeTULIP(core, tulipPath)
+    # writeLAVENDER(core, lavenderPath)
 
-# Generate Input Cards
-cwd = os.getcwd()
-tulipPath = os.path.join(cwd, 'output', "TPmate.inp")
-lavenderPath = os.path.join(cwd, 'output', "lavender.inp")
+    # Or hand the geometry blocks to divider without writing the full card
+    # divideStream(jobName='div_0407', parts=iterCard(core.toTULIP()), batchSize=50)
 
-# with open(tulipPath, 'w', encoding='utf-8') as tulip:
-#     tulip.write(core.toTULIP())
+    # Or build & write the cards under a memory cap (in MB) on shared nodes, see memory.py
+    # buildLowMemory(os.path.join(cwd, 'output'), memoryCap=4096, power=62.5E6, tolerance=0.1000)
 
-# with open(lavenderPath, 'w', encoding='utf-8') as lavender:
-#     lavender.write(core.toLAVENDER())
+    # Or build many variants sharing this lattice, see sweep.py
@@ -5,8 +5,15 @@ Author: LZK
 Date: 2023-2-21
 """
 import os
+import gzip
 import shutil
+import hashlib
+import threading
 from getpass import getuser
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor
+
+from card import TulipCard, ControlCard, GeomBlock, MatBlock
 
 WORK_PATH = {
     '12247': 'G:\Research\Research\Projects\LoongSARAXVerif\code\model_ver2', 
@@ -100,116 +107,746 @@ def dict2control(controlDict) -> str:
     return '\n'.join(s)
 
 
-def generateCard(info, header, control, geometry, materials, geom_kind, jobName):
+# ###################################################
+#                   Content Hashes
+# 
+# Every geometry block is hashed with the materials it refers to,
+# so that a re-division rewrites only the batches whose content changed.
+# ###################################################
+def geometryHash(block, card) -> str:
+    """
+    Hash a geometry block together with the material blocks it refers to
+
+    Input
+    -----
+    block: card.GeomBlock, the geometry block, or anything with its digest & words
+    card: card.TulipCard, whose whole material card is hashed if the block refers to NO material explicitly
+    """
+    sha = hashlib.sha1(block.digest.encode('utf-8'))
+    refs = card.referredMaterials(block)
+    if refs:
+        for name in refs:
+            sha.update(b'\0' + card.materials[name].text.encode('utf-8'))
+    else:
+        sha.update(b'\0' + card.matText.encode('utf-8'))
+
+    return sha.hexdigest()
+
+
+def batchHash(header, control, geomHashes) -> str:
+    """
+    Hash a batch from its header, control dict & the hashes of its geometry blocks
+    """
+    sha = hashlib.sha1(header.encode('utf-8'))
+    sha.update(b'\0' + dict2control(control).encode('utf-8'))
+    for geomHash in geomHashes:
+        sha.update(b'\0' + geomHash.encode('utf-8'))
+
+    return sha.hexdigest()
+
+
+# ###################################################
+#                    File Writer
+# 
+# The directories & files of cards are created by a thread pool,
+# so that preparing the next card overlaps with the I/O of previous ones.
+# The number of pending files is bounded to cap the memory,
+# and the files written (with their directories) are flushed to disk when the writer is closed.
+# ###################################################
+class FileWriter:
+
+    def __init__(self, workers=8, maxPending=64) -> None:
+        """
+        Input
+        -----
+        workers: int, the number of I/O threads, 0 to write synchronously
+        maxPending: int, the maximum number of files waiting to be written
+        """
+        self.executor = ThreadPoolExecutor(max_workers=workers) if workers > 0 else None
+        self.slots = threading.BoundedSemaphore(max(maxPending, 1))
+        self.lock = threading.Lock()
+        self.paths = list()
+        self.errors = list()
+        self.closed = False
+
+    def write(self, path, text, compress=False, newline=None, remove=()):
+        """
+        Write text into path, creating its directory if needed
+
+        Input
+        -----
+        path: str, the path of file
+        text: str, the content
+        compress: bool, whether to compress by gzip
+        newline: str, the newline argument of open()
+        remove: ArrayLike, the paths to remove after writing, like the outdated card
+        """
+        if self.executor is None:
+            self._write(path, text, compress, newline, remove)
+            return
+
+        self.slots.acquire()
+        future = self.executor.submit(self._write, path, text, compress, newline, remove)
+        future.add_done_callback(self._done)
+
+    def _write(self, path, text, compress, newline, remove):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Write into a temporary file, so that the file is complete whenever it exists
+        tmpPath = '{}.{:d}.tmp'.format(path, threading.get_ident())
+        if compress:
+            with gzip.open(tmpPath, 'wt', encoding='utf-8', newline=newline) as f:
+                f.write(text)
+        else:
+            with open(tmpPath, 'w', encoding='utf-8', newline=newline) as f:
+                f.write(text)
+        os.replace(tmpPath, path)
+
+        for removePath in remove:
+            if os.path.exists(removePath):
+                os.remove(removePath)
+
+        with self.lock:
+            self.paths.append(path)
+
+    def _done(self, future):
+        self.slots.release()
+        if future.exception() is not None:
+            with self.lock:
+                self.errors.append(future.exception())
+
+    def shutdown(self):
+        """
+        Wait for the pending files without raising their errors or flushing them
+        """
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+        self.closed = True
+
+    def close(self, sync=True):
+        """
+        Wait for all files written, and flush them to disk
+
+        An error of any file is raised here. Only the files written by this writer are flushed,
+        NOT the whole file systems, which are shared by others on login nodes.
+        """
+        self.shutdown()
+        if self.errors:
+            raise self.errors[0]
+
+        if sync:
+            self.sync()
+
+    def sync(self):
+        """
+        Flush the files written to disk, and their directories, which hold the renames
+        """
+        for path in self.paths:
+            with open(path, 'rb+') as f:
+                os.fsync(f.fileno())
+
+        if os.name == 'nt': # Directories can NOT be opened to flush on Windows
+            return
+        for directory in sorted({os.path.dirname(path) for path in self.paths}):
+            fd = os.open(directory, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        if excType is not None:
+            self.shutdown() # Keep the error raised in the block
+        elif not self.closed:
+            self.close()
+
+
+# ###################################################
+#                  Compact Storage
+# 
+# In compact mode, a sub-card is stored as a recipe in its batch directory,
+# whose pieces are gzip files in "./@JOB_NAME/blocks/" named by their SHA1.
+# The pieces shared by batches, i.e. the header & material card, are stored only once,
+# and the card is materialized only when the batch is run.
+# After a division, the blocks referred to by NO recipe are removed by collectBlocks().
+# ###################################################
+CARD_NAME = 'TPmate.inp'
+RECIPE_NAME = 'TPmate.recipe'
+BLOCKS_DIR = 'blocks'
+
+
+class BlockStore:
+
+    def __init__(self, jobName, writer=None) -> None:
+        """
+        Content-addressed storage of card pieces in "./@JOB_NAME/blocks/"
+
+        The blocks are written by writer (a FileWriter), or synchronously if it is None.
+        """
+        self.path = os.path.join(os.getcwd(), jobName, BLOCKS_DIR)
+        if not os.path.exists(self.path):
+            os.mkdir(self.path)
+        self.writer = writer or FileWriter(workers=0)
+        self.shared = dict() # shared text -> SHA1, so that the header, CONTROL & material card are hashed once
+        self.stored = set()  # SHA1 of the blocks submitted to writer, which may be still pending
+
+    def put(self, text, shared=False) -> str:
+        """
+        Store a piece of text if it is NOT stored yet, and return its SHA1
+
+        Input
+        -----
+        text: str, the piece of card
+        shared: bool, whether the text is shared by batches, like the header & material card,
+                whose SHA1 is then kept by content. The geometry of a batch is NOT kept.
+        """
+        if shared and text in self.shared:
+            return self.shared[text]
+
+        sha = hashlib.sha1(text.encode('utf-8')).hexdigest()
+        path = os.path.join(self.path, sha + '.gz')
+        if sha not in self.stored and not os.path.exists(path):
+            self.writer.write(path, text, compress=True, newline='')
+        self.stored.add(sha)
+        if shared:
+            self.shared[text] = sha
+
+        return sha
+
+    def get(self, sha) -> str:
+        with gzip.open(os.path.join(self.path, sha + '.gz'), 'rt', encoding='utf-8', newline='') as f:
+            return f.read()
+
+
+def materialize(jobName, matDir) -> str:
+    """
+    Materialize the card of a batch from its recipe, if it is NOT materialized yet
+
+    Return
+    ------
+    The path of TPmate.inp
+    """
+    path = os.path.join(os.getcwd(), jobName, matDir)
+    cardPath = os.path.join(path, CARD_NAME)
+    if os.path.exists(cardPath) or not os.path.exists(os.path.join(path, RECIPE_NAME)):
+        return cardPath
+
+    blocksPath = os.path.join(os.getcwd(), jobName, BLOCKS_DIR)
+    with open(os.path.join(path, RECIPE_NAME), 'r', encoding='utf-8') as recipe, \
+         open(cardPath + '.tmp', 'w', encoding='utf-8', newline='') as card:
+        for line in recipe:
+            kind, _, value = line.rstrip('\n').partition(' ')
+            if kind == 'block':
+                with gzip.open(os.path.join(blocksPath, value + '.gz'), 'rt', encoding='utf-8', newline='') as block:
+                    shutil.copyfileobj(block, card)
+            elif kind == 'text':
+                card.write(value + '\n')
+    os.replace(cardPath + '.tmp', cardPath)
+
+    return cardPath
+
+
+def collectBlocks(batches, jobName) -> int:
+    """
+    Remove the blocks referred to by NO recipe of the batches, like those left by the last division
+
+    Return
+    ------
+    The number of blocks removed
+    """
+    blocksPath = os.path.join(os.getcwd(), jobName, BLOCKS_DIR)
+    if not os.path.exists(blocksPath):
+        return 0
+
+    referred = set()
+    for info in batches:
+        recipePath = os.path.join(os.getcwd(), jobName, info['matDir'], RECIPE_NAME)
+        if os.path.exists(recipePath):
+            with open(recipePath, 'r', encoding='utf-8') as recipe:
+                referred.update(line.rstrip('\n')[len('block '):] for line in recipe if line.startswith('block '))
+
+    removed = 0
+    for name in os.listdir(blocksPath):
+        if name.endswith('.gz') and name[:-len('.gz')] not in referred:
+            os.remove(os.path.join(blocksPath, name))
+            removed += 1
+
+    return removed
+
+
+def cardExists(jobName, matDir) -> bool:
+    """
+    Whether the card of a batch is generated, either materialized or as a recipe
+    """
+    path = os.path.join(os.getcwd(), jobName, matDir)
+    return os.path.exists(os.path.join(path, CARD_NAME)) or os.path.exists(os.path.join(path, RECIPE_NAME))
+
+
+def generateCard(info, header, control, geometry, materials, geom_kind, jobName, store=None, writer=None):
+    """
+    Generate the sub-card of a batch in "./@JOB_NAME/matXXX-YYY/TPmate.inp"
+
+    Input
+    -----
+    info: dict, the batch, containing startId, endId & matDir
+    header: str, the header of TULIP card
+    control: dict, the CONTROL entries
+    geometry: list, the card.GeomBlock of the batch
+    materials: str, the material card, or None to append it later by appendMaterials()
+    geom_kind: str, the geom_kind of the batch
+    jobName: str, the name of job
+    store: BlockStore, if given, the card is stored as "./@JOB_NAME/matXXX-YYY/TPmate.recipe"
+    writer: FileWriter, by which the card is written, or synchronously if it is None
+    """
     assert type(info) is dict
     assert type(header) is str
     assert type(control) is dict
     assert type(geometry) is list
-    assert type(materials) is str
+    assert type(materials) is str or materials is None
 
     # Modify the control
     control['n_mat'] = len(geometry)
     control['geom_kind'] = geom_kind
 
     # Re-arrange the sections
-    for newId, section in enumerate(geometry):
-        lines = section.split('\n')
-        for lineIdx in range(len(lines)):
-            if 'mat' in lines[lineIdx] and '_' not in lines[lineIdx]:
-                lines[lineIdx] = 'mat{:d}'.format(newId+1)
-        geometry[newId] = '\n'.join(lines)
+    geometry = [block.renumber(newId+1) for newId, block in enumerate(geometry)]
 
-    # Add information into header
-    header = '! MAT{:d}-{:d} created by divider.py\n'.format(info['startId'], info['endId']) + header
+    # Information of the batch
+    infoLine = '! MAT{:d}-{:d} created by divider.py'.format(info['startId'], info['endId'])
+
+    # Save the new card in path "./@JOB_NAME/matXXX-YYY/TPmate.inp"
+    # The startId & endId of the batch are recorded in the manifest of the job
+    path = os.path.join(os.getcwd(), jobName, info['matDir'])
+    writer = writer or FileWriter(workers=0)
+
+    controlText = '\n\nCONTROL:\n' + dict2control(control) + '\n\nGEOMETRY:\n'
+    geometryText = '\n\n'.join(geometry)
+    if store is not None:
+        recipe = [
+            '# Recipe of {} created by divider.py'.format(CARD_NAME), 'text ' + infoLine,
+            'block ' + store.put(header, shared=True),
+            'block ' + store.put(controlText, shared=True),
+            'block ' + store.put(geometryText)
+        ]
+        if materials is not None:
+            recipe += ['text ', 'text ', 'text MATERIAL:', 'block ' + store.put(materials, shared=True)]
+        writer.write(os.path.join(path, RECIPE_NAME), '\n'.join(recipe) + '\n', remove=(os.path.join(path, CARD_NAME),))
+        return
 
     # Merge sub-cards into TPmate.inp
-    card = header + '\n\nCONTROL:\n' + dict2control(control)\
-                  + '\n\nGEOMETRY:\n' + '\n\n'.join(geometry)\
-                  + '\n\nMATERIAL:\n' + materials
+    card = infoLine + '\n' + header + controlText + geometryText
+    if materials is not None:
+        card += '\n\nMATERIAL:\n' + materials
+
+    writer.write(os.path.join(path, CARD_NAME), card, remove=(os.path.join(path, RECIPE_NAME),))
+
+
+# ###################################################
+#                Manifest & Job Array
+# 
+# Instead of copying the shell scripts into every batch directory,
+# the batches are listed once in "./@JOB_NAME/manifest.txt",
+# and a single job-array driver resolves its batch from the array index.
+# ###################################################
+MANIFEST_NAME = 'manifest.txt'
+FANOUT_NAME = 'fanout.txt'
+DRIVER_NAME = 'jobarray.sh'
+SHELL_TEMPLATES = ('env.sh', 'jobsubmit.sh', 'loongsarax.sh')
+
+DRIVER_TEMPLATE = """#!/bin/bash
+# Job-array driver of @JOB_NAME created by divider.py
+# Submit it as an array of @BATCH_NUM tasks indexed from 0 to @LAST_ID,
+# or run a single batch locally with `bash @DRIVER_NAME <cardId>`
+JOB_DIR=${JOB_DIR:-@JOB_DIR}
+INDEX=${1:-${SLURM_ARRAY_TASK_ID:-${PBS_ARRAY_INDEX:-${LSB_JOBINDEX}}}}
+
+# Resolve the batch directory from the manifest
+export MAT_ID=$(awk -v idx="${INDEX}" '$1 == idx {print $2}' "${JOB_DIR}/@MANIFEST_NAME")
+if [ -z "${MAT_ID}" ]; then
+    echo "No batch with cardId [${INDEX}] in ${JOB_DIR}/@MANIFEST_NAME" >&2
+    exit 1
+fi
+
+cd "${JOB_DIR}/${MAT_ID}" || exit 1
+
+# Materialize the card of compact division from its recipe
+if [ ! -f @CARD_NAME ] && [ -f @RECIPE_NAME ]; then
+    while IFS= read -r line; do
+        case "${line}" in
+            "block "*) gzip -dc "${JOB_DIR}/@BLOCKS_DIR/${line#block }.gz" ;;
+            "text "*) printf '%s\n' "${line#text }" ;;
+        esac
+    done < @RECIPE_NAME > @CARD_NAME.tmp && mv @CARD_NAME.tmp @CARD_NAME
+fi
+
+source "${JOB_DIR}/env.sh"
+bash "${JOB_DIR}/loongsarax.sh"
+"""
 
-    # Save the new card in path "./@JOB_NAME/matXXX-YYY/TPmate.inp"
-    path = os.path.join(os.getcwd(), jobName, "mat{:d}-{:d}".format(info['startId'], info['endId']))
+
+def generateManifest(batches, jobName):
+    """
+    Record all batches of the job in "./@JOB_NAME/manifest.txt"
+
+    Input
+    -----
+    batches: list, the info dict of every batch, containing cardId, matDir, startId, endId, hash & state
+    jobName: str, the name of job
+    """
+    path = os.path.join(os.getcwd(), jobName)
     if not os.path.exists(path):
         os.mkdir(path)
-    with open(os.path.join(path, 'TPmate.inp'), 'w', encoding='utf-8') as f:
-        f.write(card)
 
-    # Auxiliary file
-    with open(os.path.join(path, 'info.txt'), 'w', encoding='utf-8') as f:
-        f.write('{:<10}{:d}\n'.format('startId', info['startId']))
-        f.write('{:<10}{:d}'.format('endId', info['endId']))
-        # f.write('{:<10}{:d}'.format())
+    lines = ['{:<10}{:<20}{:<10}{:<10}{:<42}{}'.format('!cardId', 'matDir', 'startId', 'endId', 'hash', 'state')]
+    for info in batches:
+        lines.append('{:<10d}{:<20}{:<10d}{:<10d}{:<42}{}'.format(
+            info['cardId'], info['matDir'], info['startId'], info['endId'], info['hash'], info['state']
+        ))
+
+    with open(os.path.join(path, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
+def readManifest(jobName) -> list:
+    """
+    Read the batches recorded in "./@JOB_NAME/manifest.txt"
+
+    Return
+    ------
+    A list of info dict, like [{'cardId': 0, 'matDir': 'mat1-50', 'startId': 1, 'endId': 50, 'hash': '3f7a...', 'state': 'dirty'}, ...]
+    The hash & state are None in manifests written before they were recorded.
+    """
+    batches = []
+    with open(os.path.join(os.getcwd(), jobName, MANIFEST_NAME), 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.startswith('!') or not line.strip():
+                continue
+            fields = line.split()
+            batches.append({
+                'cardId': int(fields[0]),
+                'matDir': fields[1],
+                'startId': int(fields[2]),
+                'endId': int(fields[3]),
+                'hash': fields[4] if len(fields) > 4 else None,
+                'state': fields[5] if len(fields) > 5 else None
+            })
+
+    return batches
+
+
+def generateFanout(fanout, jobName):
+    """
+    Record the fan-out table of deduplicated geometries in "./@JOB_NAME/fanout.txt"
+
+    Input
+    -----
+    fanout: dict, mapping the ID of every unique geometry to the IDs of its original materials
+    jobName: str, the name of job
+    """
+    lines = ['{:<10}{}'.format('!uniqueId', 'matId')]
+    for uniqueId in sorted(fanout.keys()):
+        for matId in fanout[uniqueId]:
+            lines.append('{:<10d}{:d}'.format(uniqueId, matId))
+
+    with open(os.path.join(os.getcwd(), jobName, FANOUT_NAME), 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
+def readFanout(jobName):
+    """
+    Read the fan-out table recorded in "./@JOB_NAME/fanout.txt"
+
+    Return
+    ------
+    A dict like {1: [1, 5, 9], 2: [2], ...}, or None if the job is NOT deduplicated
+    """
+    path = os.path.join(os.getcwd(), jobName, FANOUT_NAME)
+    if not os.path.exists(path):
+        return None
 
+    fanout = dict()
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.startswith('!') or not line.strip():
+                continue
+            uniqueId, matId = line.split()[:2]
+            fanout.setdefault(int(uniqueId), []).append(int(matId))
 
-def generateShell(info, jobName):
-    cwd = os.getcwd()
-    matId = "mat{:d}-{:d}".format(info['startId'], info['endId'])
-    path = os.path.join(cwd, jobName, matId)
-    for shellFile in ('env.sh', 'jobsubmit.sh', 'loongsarax.sh'):
-        shutil.copy(os.path.join(cwd, shellFile), os.path.join(path, shellFile))
-    
-    # Replace tags in loongsarax.sh
-    loongsaraxText = str()
-    with open(os.path.join(path, 'loongsarax.sh'), 'r', encoding='utf-8') as loongsarax:
-        loongsaraxText = loongsarax.read()
-        loongsaraxText = loongsaraxText.replace('@JOB_NAME', jobName)
-        # loongsaraxText.replace('@BATCH_NAME', )
-        loongsaraxText = loongsaraxText.replace('@MAT_ID', matId)
-    
-    with open(os.path.join(path, 'loongsarax.sh'), 'w', encoding='utf-8') as loongsarax:
-        loongsarax.write(loongsaraxText)
-
-    # Replace tags in jobsubmit.sh
-    jobsubmitText = str()
-    with open(os.path.join(path, 'jobsubmit.sh'), 'r', encoding='utf-8') as jobsubmit:
-        jobsubmitText = jobsubmit.read()
-        jobsubmitText = jobsubmitText.replace('@JOB_NAME', jobName)
-        # jobsubmitText.replace('@BATCH_NAME', )
-        jobsubmitText = jobsubmitText.replace('@MAT_ID', matId)
-    
-    with open(os.path.join(path, 'jobsubmit.sh'), 'w', encoding='utf-8') as jobsubmit:
-        jobsubmit.write(jobsubmitText)
+    return fanout
 
 
-def divide(jobName, cardPath, batchSize):
-    # Read in TULIP input card
-    with open(cardPath, 'r', encoding='utf-8') as f:
-        card = f.read()
+def dedupGeometry(geometry, geomHashes, gk):
+    """
+    Keep only the first one of identical geometry blocks
+
+    Two blocks are identical if they have the same canonical text, referred materials & geom_kind.
 
-    # Divide into cards
-    header, remains = card.split('CONTROL:')
-    control, remains = remains.split('GEOMETRY:')
-    geometry, materials = remains.split('MATERIAL:')
+    Return
+    ------
+    (unique geometry, their hashes, GeomKind of unique geometry, fan-out table)
+    """
+    kinds = [kind for kind, value in zip(gk.kinds, gk.values) for _ in range(value)]
 
-    # Divide the geometry card
-    geometry = divideGeometry(geometry)
+    uniqueIds = dict()
+    fanout = dict()
+    uniqueGeometry, uniqueHashes, uniqueKinds = [], [], []
+    for matId, (block, geomHash, kind) in enumerate(zip(geometry, geomHashes, kinds), start=1):
+        key = (geomHash, kind)
+        if key not in uniqueIds:
+            uniqueIds[key] = len(uniqueGeometry) + 1
+            uniqueGeometry.append(block)
+            uniqueHashes.append(geomHash)
+            uniqueKinds.append(kind)
+        fanout.setdefault(uniqueIds[key], []).append(matId)
 
-    # Turn the control card into dict
-    control = control2dict(control)
+    uniqueGk = GeomKind(string=' '.join('1*{}'.format(kind) for kind in uniqueKinds))
+    uniqueGk.parse()
+
+    return uniqueGeometry, uniqueHashes, uniqueGk, fanout
+
+
+def renderTemplate(text, tags) -> str:
+    """
+    Replace the tags (like '@JOB_NAME') in the template text
+    """
+    for tag, value in tags.items():
+        text = text.replace(tag, str(value))
+    return text
+
+
+def generateShell(batches, jobName):
+    """
+    Render the shell templates once into "./@JOB_NAME/" and generate the job-array driver
+
+    The tag @MAT_ID in templates is replaced by the shell variable ${MAT_ID},
+    which is exported by the driver according to the array index.
+    """
+    cwd = os.getcwd()
+    path = os.path.join(cwd, jobName)
+    tags = {'@JOB_NAME': jobName, '@MAT_ID': '${MAT_ID}'}
+
+    # Render templates in memory & write them only once per job
+    for shellFile in SHELL_TEMPLATES:
+        with open(os.path.join(cwd, shellFile), 'r', encoding='utf-8') as template:
+            text = renderTemplate(template.read(), tags)
+        with open(os.path.join(path, shellFile), 'w', encoding='utf-8', newline='\n') as f:
+            f.write(text)
+
+    # Job-array driver
+    driver = renderTemplate(DRIVER_TEMPLATE, {
+        '@JOB_NAME': jobName,
+        '@JOB_DIR': path,
+        '@BATCH_NUM': len(batches),
+        '@LAST_ID': len(batches) - 1,
+        '@DRIVER_NAME': DRIVER_NAME,
+        '@MANIFEST_NAME': MANIFEST_NAME,
+        '@CARD_NAME': CARD_NAME,
+        '@RECIPE_NAME': RECIPE_NAME,
+        '@BLOCKS_DIR': BLOCKS_DIR
+    })
+    with open(os.path.join(path, DRIVER_NAME), 'w', encoding='utf-8', newline='\n') as f:
+        f.write(driver)
+
+
+def divide(jobName, cardPath, batchSize, shell=False, incremental=False, dedup=False, compact=False, workers=8):
+    """
+    Divide the TULIP input card into batches of geometry
+
+    Input
+    -----
+    jobName: str, the name of job, which is also the output directory
+    cardPath: str, the path of TULIP input card
+    batchSize: int, the number of geometries in every batch
+    shell: bool, whether to generate the job-array driver from the shell templates in cwd
+    incremental: bool, whether to keep the batches whose hash is unchanged since the last division
+    dedup: bool, whether to solve identical geometry blocks only once, see dedupGeometry()
+    compact: bool, whether to store the cards as recipes of compressed & shared blocks, see BlockStore
+    workers: int, the number of threads writing the cards, 0 to write synchronously, see FileWriter
+
+    Every batch is marked 'dirty' if its card is (re-)written, otherwise 'clean' in the manifest.
+    With dedup, the batches are numbered by unique geometries, and the fan-out table
+    to the original materials is recorded for merging.
+    """
+    # Read in TULIP input card
+    card = TulipCard.read(cardPath)
+    geometry = card.geometry
+    control = card.control.toDict()
 
     # Garantee geom_kind matches mat
     gk = GeomKind(string=control['geom_kind'])
     gk.parse()
 
+    # Hash the geometry blocks with the materials they refer to
+    geomHashes = [geometryHash(block, card) for block in geometry]
+
+    # Job directory & the hashes of last division
+    jobDir = os.path.join(os.getcwd(), jobName)
+    if not os.path.exists(jobDir):
+        os.mkdir(jobDir)
+
+    # Solve the identical geometry blocks only once
+    if dedup:
+        matNum = len(geometry)
+        geometry, geomHashes, gk, fanout = dedupGeometry(geometry, geomHashes, gk)
+        generateFanout(fanout, jobName)
+        print("{:d} unique geometries out of {:d} materials in [{}].".format(len(fanout), matNum, jobName))
+    elif os.path.exists(os.path.join(jobDir, FANOUT_NAME)):
+        os.remove(os.path.join(jobDir, FANOUT_NAME))
+
+    previous = dict()
+    if incremental and os.path.exists(os.path.join(jobDir, MANIFEST_NAME)):
+        previous = {info['matDir']: info['hash'] for info in readManifest(jobName)}
+
     # Allocate geometry & Generate cards
-    for batchId in range(len(geometry) // batchSize + int(bool(len(geometry) % batchSize))):
-        info = {
-            'cardId': batchId,
-            'startId': batchId * batchSize + 1,
-            'endId': min((batchId + 1) * batchSize, len(geometry)-1)
-        }
-        geom_kind = gk.pop(num=batchSize)
+    # The manifest is written only after all cards are on disk, when the writer is closed
+    batches = []
+    with FileWriter(workers=workers) as writer:
+        store = BlockStore(jobName, writer) if compact else None
+        for batchId in range(len(geometry) // batchSize + int(bool(len(geometry) % batchSize))):
+            info = {
+                'cardId': batchId,
+                'startId': batchId * batchSize + 1,
+                'endId': min((batchId + 1) * batchSize, len(geometry))
+            }
+            info['matDir'] = "mat{:d}-{:d}".format(info['startId'], info['endId'])
+            geom_kind = gk.pop(num=batchSize)
+
+            # Skip the batch if its content is unchanged
+            batchControl = dict(control)
+            batchControl['n_mat'] = info['endId'] - info['startId'] + 1
+            batchControl['geom_kind'] = geom_kind
+            info['hash'] = batchHash(card.header, batchControl, geomHashes[info['startId']-1:info['endId']])
+            if previous.get(info['matDir']) == info['hash'] and cardExists(jobName, info['matDir']):
+                info['state'] = 'clean'
+            else:
+                info['state'] = 'dirty'
+                generateCard(
+                    info=info,
+                    header=card.header,
+                    control=control,
+                    geometry=geometry[info['startId']-1:info['endId']],
+                    materials=card.matText,
+                    geom_kind=geom_kind,
+                    jobName=jobName,
+                    store=store,
+                    writer=writer
+                )
+            batches.append(info)
+
+    if incremental:
+        dirtyNum = sum(info['state'] == 'dirty' for info in batches)
+        print("{:d} of {:d} batches rewritten in [{}].".format(dirtyNum, len(batches), jobName))
+
+    # Record the batches & generate the job-array driver
+    generateManifest(batches, jobName)
+    if shell:
+        generateShell(batches, jobName)
+
+    # The blocks of rewritten batches are NOT referred to any more
+    removed = collectBlocks(batches, jobName)
+    if removed:
+        print("{:d} unused blocks removed from [{}].".format(removed, jobName))
+
+    return batches
+
+
+def appendMaterials(batches, jobName, materials):
+    """
+    Append the material card to the sub-cards generated without it
+    """
+    for info in batches:
+        with open(os.path.join(os.getcwd(), jobName, info['matDir'], CARD_NAME), 'a', encoding='utf-8') as f:
+            f.write('\n\nMATERIAL:\n' + materials)
+
+
+def divideStream(jobName, parts, batchSize, shell=False, workers=8):
+    """
+    Divide the TULIP card streamed part by part, like output.iterCard(core.toTULIP())
+
+    Every batch is written as soon as its geometry blocks arrive, and the material card,
+    which comes at last, is appended to all batches at the end.
+    So the divider never parses the whole card or keeps a copy of it,
+    while the caller may still hold the card string, like Core.toTULIP() does.
+
+    Input
+    -----
+    jobName: str, the name of job, which is also the output directory
+    parts: iterable, (part, chunk) of TULIP card, see output.iterCard()
+    batchSize: int, the number of geometries in every batch
+    shell: bool, whether to generate the job-array driver from the shell templates in cwd
+    workers: int, the number of threads writing the cards, 0 to write synchronously, see FileWriter
+    """
+    jobDir = os.path.join(os.getcwd(), jobName)
+    if not os.path.exists(jobDir):
+        os.mkdir(jobDir)
+    if os.path.exists(os.path.join(jobDir, FANOUT_NAME)):
+        os.remove(os.path.join(jobDir, FANOUT_NAME))
+
+    header, control, gk, materials = None, None, None, None
+    batches, batchBlocks, digests = [], [], []
+
+    def flush():
+        info = {'cardId': len(batches), 'startId': len(digests) + 1}
+        info['endId'] = info['startId'] + len(batchBlocks) - 1
+        info['matDir'] = "mat{:d}-{:d}".format(info['startId'], info['endId'])
+        info['control'] = dict(control)
         generateCard(
             info=info,
             header=header,
-            control=control,
-            geometry=geometry[info['startId']-1:info['endId']],
-            materials=materials,
-            geom_kind=geom_kind,
-            jobName=jobName
+            control=info['control'],
+            geometry=batchBlocks,
+            materials=None,
+            geom_kind=gk.pop(num=len(batchBlocks)),
+            jobName=jobName,
+            writer=writer
         )
-        
-        # generateShell(info=info, jobName=jobName)
+        batches.append(info)
+
+        # Only the digest & words of blocks are kept for hashing
+        for block in batchBlocks:
+            digests.append(SimpleNamespace(digest=block.digest, words=block.words))
+        batchBlocks.clear()
+
+    with FileWriter(workers=workers) as writer:
+        for part, chunk in parts:
+            if part == 'header':
+                header = chunk
+            elif part == 'control':
+                control = ControlCard(chunk).toDict()
+                gk = GeomKind(string=control['geom_kind'])
+                gk.parse()
+            elif part == 'geometry':
+                block = GeomBlock(chunk)
+                if block.isBlock:
+                    batchBlocks.append(block)
+                if len(batchBlocks) == batchSize:
+                    flush()
+            elif part == 'material':
+                materials = chunk
+        if batchBlocks:
+            flush()
+        writer.close(sync=False) # The cards are complete before the materials are appended
+
+    appendMaterials(batches, jobName, materials)
+    writer.sync()
+
+    # Hash the batches as divide() does
+    matCard = TulipCard(header, ControlCard(''), [], [MatBlock(piece) for piece in materials.split(TulipCard.MAT_SEP)])
+    for info in batches:
+        geomHashes = [geometryHash(stub, matCard) for stub in digests[info['startId']-1:info['endId']]]
+        info['hash'] = batchHash(header, info.pop('control'), geomHashes)
+        info['state'] = 'dirty'
+
+    generateManifest(batches, jobName)
+    if shell:
+        generateShell(batches, jobName)
+    collectBlocks(batches, jobName)
+
+    return batches
 
 
 if __name__ == '__main__':
@@ -0,0 +1,352 @@
+"""
+Hexagonal geometry of core lattice
+
+The positions of lattice are indexed like core.lattice, by ring r (from 0) and
+position k (from 0 to 6r-1) in the ring, or by one flat index
+```
+index(r, k) = 1 + 3r(r-1) + k, index(0, 0) = 0
+```
+Every position also has cube coordinates (x, y, z) with x + y + z = 0, so that
+the rotations & reflections of hexagon become permutations of the flat indices,
+and the neighbors are looked up in a precomputed table.
+
+CompactLattice keeps the lattice as an array of assembly codes into a table of
+unique assemblies, with the slug densities of every position in one shared tensor.
+"""
+from functools import lru_cache
+
+import numpy as np
+
+RING_NUM = 16
+
+# Cube coordinates of the 6 corners of ring 1, in the order of k
+DIRECTIONS = np.array([
+    (1, -1, 0),
+    (1, 0, -1),
+    (0, 1, -1),
+    (-1, 1, 0),
+    (-1, 0, 1),
+    (0, -1, 1)
+])
+
+
+def ringSize(r) -> int:
+    return 6 * r if r > 0 else 1
+
+
+def positionNum(ringNum=RING_NUM) -> int:
+    return 1 + 3 * ringNum * (ringNum - 1)
+
+
+def flatIndex(r, k) -> int:
+    return 1 + 3 * r * (r - 1) + k if r > 0 else 0
+
+
+@lru_cache(maxsize=None)
+def positions(ringNum=RING_NUM) -> np.ndarray:
+    """
+    The (r, k) of all positions in the order of flat index, shape (N, 2)
+    """
+    return np.array([(r, k) for r in range(ringNum) for k in range(ringSize(r))])
+
+
+@lru_cache(maxsize=None)
+def locations(ringNum=RING_NUM) -> np.ndarray:
+    """
+    The locations "RRSKK" of all positions in the order of flat index, like SlugMat.convertLocation()
+    """
+    symbols = 'CDEFAB' # Map from sector to symbol, like 0 -> 'C'
+    return np.array(['01A01' if r == 0 else '{:0>2d}{}{:0>2d}'.format(r + 1, symbols[k // r], k % r + 1) for r, k in positions(ringNum)])
+
+
+@lru_cache(maxsize=None)
+def cubeCoords(ringNum=RING_NUM) -> np.ndarray:
+    """
+    The cube coordinates of all positions in the order of flat index, shape (N, 3)
+
+    Position k of ring r lies on the side from corner k // r, walking k % r steps to the next corner.
+    """
+    rk = positions(ringNum)
+    r, k = rk[:, 0], rk[:, 1]
+    sector = np.where(r > 0, k // np.maximum(r, 1), 0)
+    step = np.where(r > 0, k % np.maximum(r, 1), 0)
+    return r[:, None] * DIRECTIONS[sector] + step[:, None] * DIRECTIONS[(sector + 2) % 6]
+
+
+@lru_cache(maxsize=None)
+def cubeTable(ringNum=RING_NUM) -> np.ndarray:
+    """
+    The flat index at cube coordinates (x, y), stored at [x + ringNum - 1, y + ringNum - 1], -1 outside the lattice
+    """
+    size = 2 * ringNum - 1
+    table = np.full((size, size), -1, dtype=int)
+    cube = cubeCoords(ringNum)
+    table[cube[:, 0] + ringNum - 1, cube[:, 1] + ringNum - 1] = np.arange(len(cube))
+    return table
+
+
+def cubeIndex(cube, ringNum=RING_NUM) -> np.ndarray:
+    """
+    The flat indices of cube coordinates, shape (..., 3) -> (...), -1 outside the lattice
+    """
+    cube = np.asarray(cube)
+    x, y = cube[..., 0] + ringNum - 1, cube[..., 1] + ringNum - 1
+    inside = (x >= 0) & (x < 2 * ringNum - 1) & (y >= 0) & (y < 2 * ringNum - 1) & (np.abs(cube).max(axis=-1) < ringNum)
+    return np.where(inside, cubeTable(ringNum)[np.clip(x, 0, 2 * ringNum - 2), np.clip(y, 0, 2 * ringNum - 2)], -1)
+
+
+# The symmetries of hexagon acting on cube coordinates
+# Rotation by 60 degrees maps position k to k + r in ring r
+TRANSFORMS = {
+    'rot60': lambda x, y, z: (-y, -z, -x),
+    'rot120': lambda x, y, z: (z, x, y),
+    'rot180': lambda x, y, z: (-x, -y, -z),
+    'mirror0': lambda x, y, z: (-y, -x, -z),
+    'mirror1': lambda x, y, z: (x, z, y),
+    'mirror2': lambda x, y, z: (-z, -y, -x),
+    'mirror3': lambda x, y, z: (y, x, z),
+    'mirror4': lambda x, y, z: (-x, -z, -y),
+    'mirror5': lambda x, y, z: (z, y, x)
+}
+
+
+@lru_cache(maxsize=None)
+def permutation(name, ringNum=RING_NUM) -> np.ndarray:
+    """
+    The flat index of the image of every position under the symmetry, like 'rot60' or 'mirror0'
+    """
+    cube = cubeCoords(ringNum)
+    image = np.stack(TRANSFORMS[name](cube[:, 0], cube[:, 1], cube[:, 2]), axis=-1)
+    return cubeIndex(image, ringNum)
+
+
+@lru_cache(maxsize=None)
+def orbitPairs(name, ringNum=RING_NUM) -> np.ndarray:
+    """
+    The pairs (idx, image of idx) to compare under the symmetry, shape (M, 2)
+
+    Every orbit of the permutation is visited once: an orbit of 2 positions gives one pair,
+    a longer orbit (like of a rotation) gives the pair of every position to its image,
+    including the last one back to the first.
+    """
+    perm = permutation(name, ringNum)
+    seen = set()
+    pairs = []
+    for start in range(len(perm)):
+        if start in seen:
+            continue
+        orbit = [start]
+        seen.add(start)
+        while perm[orbit[-1]] != start:
+            orbit.append(int(perm[orbit[-1]]))
+            seen.add(orbit[-1])
+        if len(orbit) > 1:
+            pairs.extend((idx, int(perm[idx])) for idx in (orbit if len(orbit) > 2 else orbit[:1]))
+    return np.array(pairs, dtype=int).reshape(-1, 2)
+
+
+@lru_cache(maxsize=None)
+def neighborTable(ringNum=RING_NUM) -> np.ndarray:
+    """
+    The flat indices of the 6 neighbors of every position, shape (N, 6), -1 outside the lattice
+
+    The neighbors are in the order of DIRECTIONS.
+    """
+    cube = cubeCoords(ringNum)
+    return cubeIndex(cube[:, None, :] + DIRECTIONS[None, :, :], ringNum)
+
+
+def neighbors(r, k, ringNum=RING_NUM) -> list:
+    """
+    The (r, k) of the neighbors of position (r, k), None outside the lattice
+    """
+    rk = positions(ringNum)
+    return [tuple(int(i) for i in rk[idx]) if idx >= 0 else None for idx in neighborTable(ringNum)[flatIndex(r, k)]]
+
+
+def flatten(lattice) -> list:
+    """
+    Flatten the nested lattice in the order of flat index
+    """
+    return [item for ring in lattice for item in ring]
+
+
+def nest(items, ringNum=RING_NUM) -> list:
+    """
+    Nest the items in the order of flat index into rings
+    """
+    return [list(items[flatIndex(r, 0):flatIndex(r, 0) + ringSize(r)]) for r in range(ringNum)]
+
+
+# ###################################################
+#                  Compact Lattice
+# ###################################################
+def assemblyLabel(assembly) -> str:
+    """
+    The label of assembly to save, like 'driver-MKII@01A01'
+    """
+    if isinstance(assembly, str):
+        return assembly
+    if hasattr(assembly, 'typeName') and hasattr(assembly, 'location'):
+        return '{}@{}'.format(assembly.typeName, assembly.location)
+    return repr(assembly)
+
+
+class CompactLattice:
+
+    def __init__(self, codes, assemblies, slugIndex=None, densities=None, zaids=None) -> None:
+        """
+        The core lattice as arrays over the flat indices of positions
+
+        Input
+        -----
+        codes: np.ndarray, the code of assembly at every position, shape (N,)
+        assemblies: list, the unique assemblies (or their labels if loaded), indexed by code
+        slugIndex: np.ndarray, the index of slug densities at every position, -1 without slug, shape (N,)
+        densities: np.ndarray, the slug densities, shape (M, len(zaids), slugNum)
+        zaids: np.ndarray, the ZAIDs of densities
+        """
+        self.codes = np.asarray(codes, dtype=np.int32)
+        self.assemblies = list(assemblies)
+        self.slugIndex = np.full(len(self.codes), -1, dtype=np.int32) if slugIndex is None else np.asarray(slugIndex, dtype=np.int32)
+        self.densities = np.zeros((0, 0, 0), dtype=float) if densities is None else np.asarray(densities)
+        self.zaids = np.zeros(0, dtype=np.int64) if zaids is None else np.asarray(zaids)
+
+        # Get the number of rings from the number of positions
+        self.ringNum = 1
+        while positionNum(self.ringNum) < len(self.codes):
+            self.ringNum += 1
+        if positionNum(self.ringNum) != len(self.codes):
+            raise ValueError("{:d} positions can NOT form a hexagonal lattice.".format(len(self.codes)))
+
+    @classmethod
+    def fromNested(cls, lattice, slugs=None):
+        """
+        Convert from the nested lattice like core.lattice
+
+        Input
+        -----
+        lattice: list, the rings of assemblies
+        slugs: list, the slug densities at every position in the order of flat index,
+               as DataFrame(ZAIDS, S1, S2, ...) or None, like symmetry.compositions()
+        """
+        table, codes = dict(), []
+        for assembly in flatten(lattice):
+            if id(assembly) not in table:
+                table[id(assembly)] = (len(table), assembly)
+            codes.append(table[id(assembly)][0])
+        assemblies = [assembly for code, assembly in sorted(table.values(), key=lambda item: item[0])]
+
+        if slugs is None:
+            return cls(codes, assemblies)
+
+        # Align the slug densities on the union of ZAIDs
+        present = [idx for idx, slug in enumerate(slugs) if slug is not None]
+        zaids = np.unique(np.concatenate([slugs[idx]['ZAIDS'].to_numpy() for idx in present])) if present else np.zeros(0, dtype=np.int64)
+        slugNum = max((slugs[idx].shape[1] - 1 for idx in present), default=0)
+        densities = np.zeros((len(present), len(zaids), slugNum), dtype=float)
+        slugIndex = np.full(len(codes), -1, dtype=np.int32)
+        for row, idx in enumerate(present):
+            slug = slugs[idx]
+            values = slug.drop(columns='ZAIDS').to_numpy(dtype=float)
+            densities[row, np.searchsorted(zaids, slug['ZAIDS'].to_numpy()), :values.shape[1]] = values
+            slugIndex[idx] = row
+
+        return cls(codes, assemblies, slugIndex, densities, zaids)
+
+    def toNested(self) -> list:
+        """
+        Convert to the nested lattice, sharing the assemblies of table
+        """
+        return nest([self.assemblies[code] for code in self.codes], self.ringNum)
+
+    def __getitem__(self, position):
+        """
+        The assembly at position (r, k)
+        """
+        return self.assemblies[self.codes[flatIndex(*position)]]
+
+    @property
+    def labels(self) -> np.ndarray:
+        """
+        The labels of unique assemblies, indexed by code
+        """
+        return np.array([assemblyLabel(assembly) for assembly in self.assemblies])
+
+    def where(self, assembly) -> np.ndarray:
+        """
+        The flat indices of positions holding the assembly (or its label)
+        """
+        if isinstance(assembly, str):
+            return np.flatnonzero(self.labels[self.codes] == assembly)
+        codes = [code for code, item in enumerate(self.assemblies) if item is assembly]
+        return np.flatnonzero(np.isin(self.codes, codes))
+
+    def counts(self) -> dict:
+        """
+        The number of positions of every unique assembly, label -> count
+        """
+        return dict(zip(self.labels.tolist(), np.bincount(self.codes, minlength=len(self.assemblies)).tolist()))
+
+    def slugDensities(self, position) -> np.ndarray:
+        """
+        The slug densities at position (r, k), shape (len(zaids), slugNum), None without slug
+        """
+        row = self.slugIndex[flatIndex(*position)]
+        return self.densities[row] if row >= 0 else None
+
+    def diff(self, other, tolerance=0.) -> np.ndarray:
+        """
+        The flat indices of positions whose assembly or slug densities differ from other
+
+        The assemblies are compared by identity in memory, and by label if either is loaded from file.
+        """
+        if len(self.codes) != len(other.codes):
+            raise ValueError("Lattices of {:d} & {:d} positions can NOT be compared.".format(len(self.codes), len(other.codes)))
+
+        if any(isinstance(item, str) for item in self.assemblies + other.assemblies):
+            changed = self.labels[self.codes] != other.labels[other.codes]
+        else:
+            mine = np.array([id(item) for item in self.assemblies], dtype=np.int64)
+            theirs = np.array([id(item) for item in other.assemblies], dtype=np.int64)
+            changed = mine[self.codes] != theirs[other.codes]
+
+        # The slug densities are compared on the union of ZAIDs
+        hasSlug = (self.slugIndex >= 0) | (other.slugIndex >= 0)
+        changed |= hasSlug & ((self.slugIndex < 0) | (other.slugIndex < 0))
+        both = np.flatnonzero((self.slugIndex >= 0) & (other.slugIndex >= 0))
+        if len(both):
+            zaids = np.union1d(self.zaids, other.zaids)
+            slugNum = max(self.densities.shape[2], other.densities.shape[2])
+            mine = np.zeros((len(both), len(zaids), slugNum))
+            theirs = np.zeros((len(both), len(zaids), slugNum))
+            mine[:, np.searchsorted(zaids, self.zaids), :self.densities.shape[2]] = self.densities[self.slugIndex[both]]
+            theirs[:, np.searchsorted(zaids, other.zaids), :other.densities.shape[2]] = other.densities[other.slugIndex[both]]
+            changed[both] |= (np.abs(mine - theirs) > tolerance).any(axis=(1, 2))
+
+        return np.flatnonzero(changed)
+
+    def save(self, path):
+        """
+        Save the arrays into a compressed NumPy file, with the labels of assemblies
+        """
+        np.savez_compressed(path, codes=self.codes, labels=self.labels, slugIndex=self.slugIndex, densities=self.densities, zaids=self.zaids)
+
+    @classmethod
+    def load(cls, path, assemblies=None):
+        """
+        Load the lattice saved by save()
+
+        Input
+        -----
+        path: str, the path of file
+        assemblies: dict, label -> Assembly, to restore the assemblies, otherwise the labels are kept
+        """
+        with np.load(path, allow_pickle=False) as data:
+            labels = data['labels'].tolist()
+            if assemblies is not None:
+                labels = [assemblies.get(label, label) for label in labels]
+            return cls(data['codes'], labels, data['slugIndex'], data['densities'], data['zaids'])
+
+    def __str__(self) -> str:
+        return "CompactLattice of {:d} rings: {:d} positions, {:d} unique assemblies, {:d} slug sets".format(self.ringNum, len(self.codes), len(self.assemblies), len(self.densities))
@@ -11,6 +11,8 @@ File Log:
             Class SlugMat created
 2023-1-25   Class SlugMat completed
 2023-2-1    Add some materials of HWCR & safety
+2026-10-19  Class SlugStore created
+2026-10-19  SlugStore.mix() on the shared ZAID index
 """
 import os
 import sys
@@ -23,6 +25,7 @@ PYSARAX_PATH = {
 }
 sys.path.append(PYSARAX_PATH[getuser()])
 
+import numpy as np
 import pandas as pd
 from numpy import pi
 from pySARAX import Material
@@ -312,6 +315,151 @@ class SlugMat:
 slugmat = SlugMat(path=benchmarkCsvPath)
 
 
+class SlugStore:
+
+    def __init__(self, slugmat, dtype=np.float64, releaseAfterUse=False) -> None:
+        """
+        SlugStore keeps the slug densities of all locations compactly
+
+        All ZAIDs are interned into one sorted index shared by the locations,
+        and every location keeps only the rows of its ZAIDs in that index
+        with a contiguous density array of shape (rows, slugs). pySARAX Material keeps
+        its own composition, so the index is used only where the densities are ours,
+        like mix(), and a slug enters Material by toDataFrame() & Material.fromDataFrame().
+
+        Only the slug densities are interned. Materials are still created by pySARAX and
+        mixed by label, as in the HWD rings (whose structures are mixed once, so every
+        slug is added by one Material addition), wireWrapEq (mixed once at import) and
+        calcShare() (NOT called by the model).
+
+        Input
+        -----
+        slugmat: SlugMat, the source of CSV Material Data Files
+        dtype: np.dtype, the type of densities, like np.float32 to halve the memory
+        releaseAfterUse: bool, whether to release the densities of a location after get()
+        """
+        self.slugmat = slugmat
+        self.dtype = dtype
+        self.releaseAfterUse = releaseAfterUse
+        self.zaids = np.zeros(0, dtype=np.int64)
+        self.types = dict() # location -> assembly type
+        self.data = dict()  # location -> (rows in self.zaids, densities)
+
+    def read(self, location) -> tuple:
+        """
+        Read the ZAIDs & densities of location from its CSV file
+        """
+        assemblyMat = pd.read_csv(self.slugmat.find(location))
+        zaids = assemblyMat['ZAIDS'].to_numpy(dtype=np.int64)
+        densities = np.ascontiguousarray(assemblyMat.drop(columns='ZAIDS').to_numpy(dtype=self.dtype))
+        return zaids, densities
+
+    def intern(self, zaids) -> np.ndarray:
+        """
+        Intern the ZAIDs into the shared index, and get their rows in it
+        """
+        missing = np.setdiff1d(zaids, self.zaids)
+        if len(missing):
+            merged = np.union1d(self.zaids, missing)
+            remap = np.searchsorted(merged, self.zaids).astype(np.int32)
+            self.data = {location: (remap[rows], densities) for location, (rows, densities) in self.data.items()}
+            self.zaids = merged
+        return np.searchsorted(self.zaids, zaids).astype(np.int32)
+
+    def load(self, locations=None):
+        """
+        Load the locations, default to all locations with CSV file
+        """
+        allLocations = dict(self.slugmat.allLocations)
+        if locations is None:
+            locations = allLocations.keys()
+
+        # Read all files first, so that the shared index is built once
+        loaded = {location: self.read(location) for location in locations}
+        if loaded:
+            self.intern(np.unique(np.concatenate([zaids for zaids, densities in loaded.values()])))
+        for location, (zaids, densities) in loaded.items():
+            self.types[location] = allLocations.get(location)
+            self.data[location] = (self.intern(zaids), densities)
+
+    def arrays(self, location) -> tuple:
+        """
+        Get (rows, densities) of location, reading its CSV file again if released
+        """
+        if type(location) is tuple:
+            location = self.slugmat.convertLocation(location)
+        if location not in self.data:
+            self.load((location,))
+        return self.data[location]
+
+    def get(self, location) -> tuple:
+        """
+        Get the materials of slugs at given location, like SlugMat.get()
+
+        Return
+        ------
+        (DataFrame('ZAIDS', 'Density'), DataFrame('ZAIDS', 'Density'), DataFrame('ZAIDS', 'Density'))
+        """
+        if type(location) is tuple:
+            location = self.slugmat.convertLocation(location)
+        rows, densities = self.arrays(location)
+        zaids = self.zaids[rows]
+        slugs = tuple(pd.DataFrame({'ZAIDS': zaids, 'Density': densities[:, idx].astype(np.float64)}) for idx in range(densities.shape[1]))
+
+        if self.releaseAfterUse:
+            self.release(location)
+        return slugs
+
+    def mix(self, weights) -> np.ndarray:
+        """
+        Mix the slugs of locations by scatter-adding their rows on the shared ZAID index
+
+        Input
+        -----
+        weights: dict, location -> the weight of every slug, float or ArrayLike of shape (slugs,)
+
+        Return
+        ------
+        np.ndarray, the mixed densities aligned with self.zaids, where a nuclide missing in a slug counts as 0
+        """
+        # Read the released locations first, so that the shared ZAID index stays fixed in the reduction
+        missing = [location for location in weights if location not in self.data]
+        if missing:
+            self.load(missing)
+        total = np.zeros(len(self.zaids))
+        for location, weight in weights.items():
+            rows, densities = self.data[location]
+            total[rows] += np.nan_to_num(densities) @ np.broadcast_to(np.asarray(weight, dtype=np.float64), densities.shape[1:])
+        return total
+
+    def toDataFrame(self, densities) -> pd.DataFrame:
+        """
+        Convert the densities aligned with self.zaids into DataFrame('ZAIDS', 'Density') of the nuclides present
+        """
+        present = np.flatnonzero(densities > 0.)
+        return pd.DataFrame({'ZAIDS': self.zaids[present], 'Density': densities[present]})
+
+    def release(self, location):
+        """
+        Release the densities of location, which are read again if needed
+        """
+        self.data.pop(location, None)
+
+    @property
+    def nbytes(self) -> int:
+        return self.zaids.nbytes + sum(rows.nbytes + densities.nbytes for rows, densities in self.data.values())
+
+    def __len__(self) -> int:
+        return len(self.types)
+
+    def __iter__(self):
+        """
+        Iterate (location, assemblyType, slugs) like the former list of fuelSlugs
+        """
+        for location, assemblyType in list(self.types.items()):
+            yield location, assemblyType, self.get(location)
+
+
 # Test during development
 if __name__ == '__main__':
     # result = slugmat.convertLocation(location='10B01')
@@ -0,0 +1,183 @@
+"""
+Memory tracking of core build
+
+MemoryTracker measures every phase of a build (like lattice, core, TULIP, LAVENDER):
+    - the peak of Python allocations by tracemalloc
+    - the peak of resident set size (RSS), sampled by a background thread
+and reports them against a stated memory cap, so that a full core can be planned
+on the shared login nodes.
+
+RSS is read by psutil if installed, otherwise from /proc on Linux or by
+GetProcessMemoryInfo() on Windows. Elsewhere (like macOS without psutil) it is
+reported as unavailable and the cap is NOT checked.
+"""
+import os
+import gc
+import sys
+import time
+import threading
+import tracemalloc
+from contextlib import contextmanager
+
+MB = 1024 * 1024
+
+
+def formatMB(size) -> str:
+    return 'unavailable' if size is None else '{:.1f} MB'.format(size)
+
+
+def windowsRSS() -> int:
+    """
+    The working set size of this process in bytes by GetProcessMemoryInfo() of Win32
+    """
+    import ctypes
+    from ctypes import wintypes
+
+    class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+        _fields_ = [
+            ('cb', wintypes.DWORD),
+            ('PageFaultCount', wintypes.DWORD),
+            ('PeakWorkingSetSize', ctypes.c_size_t),
+            ('WorkingSetSize', ctypes.c_size_t),
+            ('QuotaPeakPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+            ('PagefileUsage', ctypes.c_size_t),
+            ('PeakPagefileUsage', ctypes.c_size_t),
+        ]
+
+    kernel32 = ctypes.WinDLL('kernel32')
+    psapi = ctypes.WinDLL('psapi')
+    kernel32.GetCurrentProcess.restype = wintypes.HANDLE
+    psapi.GetProcessMemoryInfo.argtypes = (wintypes.HANDLE, ctypes.POINTER(PROCESS_MEMORY_COUNTERS), wintypes.DWORD)
+    psapi.GetProcessMemoryInfo.restype = wintypes.BOOL
+
+    counters = PROCESS_MEMORY_COUNTERS()
+    counters.cb = ctypes.sizeof(counters)
+    if not psapi.GetProcessMemoryInfo(kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb):
+        raise OSError("GetProcessMemoryInfo() failed.")
+    return counters.WorkingSetSize
+
+
+def currentRSS() -> int:
+    """
+    The resident set size of this process in bytes, None if NOT available
+    """
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    if sys.platform == 'win32':
+        try:
+            return windowsRSS()
+        except (OSError, AttributeError):
+            return None
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        # NOT the lifetime peak of getrusage(), which is NOT the peak of a phase
+        return None
+
+
+class MemoryTracker:
+
+    def __init__(self, cap=None, trace=True, interval=0.05, strict=False) -> None:
+        """
+        Input
+        -----
+        cap: float, the memory cap in MB, NOT checked if None
+        trace: bool, whether to trace the Python allocations by tracemalloc, which slows down the build
+        interval: float, the interval of RSS sampling in seconds
+        strict: bool, whether to raise MemoryError once a phase exceeds the cap
+        """
+        self.cap = cap
+        self.trace = trace
+        self.interval = interval
+        self.strict = strict
+        self.phases = []
+
+    @staticmethod
+    def _update(record):
+        rss = currentRSS()
+        if rss is not None:
+            record[0] = rss if record[0] is None else max(record[0], rss)
+
+    def _sample(self, stop, record):
+        while not stop.wait(self.interval):
+            self._update(record)
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Measure a phase of build
+
+        Example
+        -------
+        ```python
+        >>> with tracker.phase('lattice'):
+        ...     lattice = buildLattice()
+        ```
+        """
+        gc.collect()
+        if self.trace:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+
+        record = [None]
+        self._update(record)
+        stop = threading.Event()
+        sampler = threading.Thread(target=self._sample, args=(stop, record), daemon=True)
+        sampler.start()
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            stop.set()
+            sampler.join()
+            self._update(record)
+
+            rssPeak = None if record[0] is None else record[0] / MB
+            info = {'phase': name, 'seconds': time.perf_counter() - start, 'rssPeak': rssPeak}
+            if self.trace:
+                current, peak = tracemalloc.get_traced_memory()
+                info['traced'], info['tracedPeak'] = current / MB, peak / MB
+            self.phases.append(info)
+            print("Phase [{}] done in {:.1f} s, RSS peak {}.".format(name, info['seconds'], formatMB(rssPeak)))
+
+        if self.strict and self.cap is not None and rssPeak is not None and rssPeak > self.cap:
+            raise MemoryError("Phase [{}] peaks at {:.1f} MB over the cap {:.1f} MB.".format(name, info['rssPeak'], self.cap))
+
+    @property
+    def peak(self) -> float:
+        """
+        The RSS peak of all phases in MB, None if NOT available
+        """
+        return max((info['rssPeak'] for info in self.phases if info['rssPeak'] is not None), default=None)
+
+    def report(self) -> list:
+        """
+        Print the memory of every phase, and check the cap
+        """
+        print("{:<12}{:>10}{:>14}{:>14}{:>14}".format('phase', 'time(s)', 'RSS peak(MB)', 'traced(MB)', 'traced pk(MB)'))
+        for info in self.phases:
+            print("{:<12}{:>10.1f}{:>14}{:>14}{:>14}".format(
+                info['phase'], info['seconds'],
+                '{:.1f}'.format(info['rssPeak']) if info['rssPeak'] is not None else '-',
+                '{:.1f}'.format(info['traced']) if 'traced' in info else '-',
+                '{:.1f}'.format(info['tracedPeak']) if 'tracedPeak' in info else '-'
+            ))
+        if self.cap is not None and self.peak is None:
+            print("RSS is unavailable on this platform, the cap {:.1f} MB is NOT checked.".format(self.cap))
+        elif self.cap is not None:
+            state = 'within' if self.peak <= self.cap else 'EXCEEDS'
+            print("Peak {:.1f} MB {} the cap {:.1f} MB.".format(self.peak, state, self.cap))
+
+        return self.phases
+
+    def stop(self):
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
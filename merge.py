@@ -0,0 +1,199 @@
+"""
+Merge the results of divided TULIP jobs into a single library
+
+The sub-cards generated by divider.py renumber their geometries to mat1..matN.
+According to the batches recorded in "./@JOB_NAME/manifest.txt", the result of
+every batch is streamed line by line, its local material IDs are remapped to the
+global ones, and the lines are appended to one combined result file.
+If the job is deduplicated, the result of every unique geometry is replicated
+to all of its original materials according to "./@JOB_NAME/fanout.txt".
+The block of every unique geometry is spilled to "@OUTPUT.blocks.tmp" as soon as
+it is read, with its byte offset recorded, and the replicas are then written in the
+order of original material IDs by seeking back to the blocks one at a time.
+"""
+import os
+import re
+
+from divider import readManifest, readFanout
+
+RESULT_NAME = 'TPmate.out'
+
+# Material tag in the result, like "mat12" or "MAT12"
+MAT_PATTERN = re.compile(r'\b(mat|MAT)(\d+)\b')
+
+
+def checkBatches(batches, jobName, resultName=RESULT_NAME) -> list:
+    """
+    Check the batches of job before merging
+
+    Return
+    ------
+    A list of problems, like missing or duplicated batches, which is empty if all batches are ready
+    """
+    problems = []
+    jobDir = os.path.join(os.getcwd(), jobName)
+
+    # Duplicated batches
+    seenDirs = set()
+    for info in batches:
+        if info['matDir'] in seenDirs:
+            problems.append("Batch [{}] is duplicated in manifest.".format(info['matDir']))
+        seenDirs.add(info['matDir'])
+
+    # Overlapping or missing material ranges
+    expected = 1
+    for info in sorted(batches, key=lambda x: x['startId']):
+        if info['startId'] > expected:
+            problems.append("MAT{:d}-{:d} is NOT covered by any batch.".format(expected, info['startId']-1))
+        elif info['startId'] < expected:
+            problems.append("Batch [{}] overlaps with MAT{:d}-{:d}.".format(info['matDir'], info['startId'], expected-1))
+        expected = max(expected, info['endId'] + 1)
+
+    # Missing results
+    for info in batches:
+        if not os.path.exists(os.path.join(jobDir, info['matDir'], resultName)):
+            problems.append("Result of batch [{}] is missing.".format(info['matDir']))
+
+    return problems
+
+
+def remapLine(line, info):
+    """
+    Remap the local material IDs in line to global ones
+
+    Return
+    ------
+    (remapped line, list of global IDs found in line)
+    """
+    globalIds = []
+
+    def remap(match):
+        localId = int(match.group(2))
+        globalId = info['startId'] + localId - 1
+        if localId < 1 or globalId > info['endId']:
+            raise ValueError("{}{:d} is out of batch [{}].".format(match.group(1), localId, info['matDir']))
+        globalIds.append(globalId)
+        return '{}{:d}'.format(match.group(1), globalId)
+
+    return MAT_PATTERN.sub(remap, line), globalIds
+
+
+def replicateBlock(block, uniqueId, matIds):
+    """
+    Replicate the result block of a unique geometry to its original materials
+    """
+    def retag(matId):
+        return lambda match: '{}{:d}'.format(match.group(1), matId) if int(match.group(2)) == uniqueId else match.group(0)
+
+    for matId in matIds:
+        for line in block:
+            yield MAT_PATTERN.sub(retag(matId), line)
+
+
+def merge(jobName, outputPath, resultName=RESULT_NAME) -> dict:
+    """
+    Merge the results of all batches into a single file
+
+    The results are streamed batch by batch, so that only one material block stays in memory,
+    also if the job is deduplicated, whose unique blocks are spilled to a temporary file.
+    The combined file is written to a temporary path & renamed at the end,
+    so it never contains a partial merge.
+
+    Input
+    -----
+    jobName: str, the name of job divided by divider.py
+    outputPath: str, the path of combined result file
+    resultName: str, the name of result file in every batch directory
+
+    Return
+    ------
+    A dict reporting the numbers of batches & materials merged
+    """
+    batches = readManifest(jobName)
+    problems = checkBatches(batches, jobName, resultName)
+    if problems:
+        raise RuntimeError("Job [{}] could NOT be merged:\n{}".format(jobName, '\n'.join(problems)))
+
+    # The fan-out table of deduplicated job, otherwise every geometry is a material itself
+    fanout = readFanout(jobName)
+    dedup = fanout is not None
+    total = max(info['endId'] for info in batches) if batches else 0
+    if not dedup:
+        fanout = {matId: [matId] for matId in range(1, total + 1)}
+    else:
+        total = max(max(matIds) for matIds in fanout.values())
+
+    jobDir = os.path.join(os.getcwd(), jobName)
+    seen = set()
+    spillPath = outputPath + '.blocks.tmp'
+    offsets = dict() # uniqueId -> (start, end) in the spill file, only if deduplicated
+
+    def flush(uniqueId, block):
+        if dedup:
+            start = spill.tell()
+            spill.write(''.join(block).encode('utf-8'))
+            offsets[uniqueId] = (start, spill.tell())
+        else:
+            output.writelines(replicateBlock(block, uniqueId, fanout[uniqueId]))
+
+    def readBlock(uniqueId):
+        start, end = offsets[uniqueId]
+        spill.seek(start)
+        return spill.read(end - start).decode('utf-8').splitlines(keepends=True)
+
+    spill = open(spillPath, 'w+b') if dedup else None
+    try:
+        with open(outputPath + '.tmp', 'w', encoding='utf-8') as output:
+            output.write('! Merged from {:d} batches of {} by merge.py\n'.format(len(batches), jobName))
+            for info in sorted(batches, key=lambda x: x['startId']):
+                with open(os.path.join(jobDir, info['matDir'], resultName), 'r', encoding='utf-8') as result:
+                    uniqueId, block = None, []
+                    for line in result:
+                        if line.startswith('!'):
+                            continue
+                        line, globalIds = remapLine(line, info)
+
+                        # A material block starts with its tag, like "mat12"
+                        if globalIds and MAT_PATTERN.match(line.strip()):
+                            if uniqueId is not None:
+                                flush(uniqueId, block)
+                            uniqueId, block = globalIds[0], []
+                            for matId in fanout[uniqueId]:
+                                if matId in seen:
+                                    raise RuntimeError("MAT{:d} is duplicated in batch [{}].".format(matId, info['matDir']))
+                                seen.add(matId)
+
+                        if uniqueId is None:
+                            output.write(line)
+                        else:
+                            block.append(line)
+
+                    if uniqueId is not None:
+                        flush(uniqueId, block)
+
+            # The replicas in the order of original material IDs, as if NOT deduplicated
+            if dedup:
+                uniqueOf = {matId: uniqueId for uniqueId, matIds in fanout.items() for matId in matIds}
+                for matId in sorted(uniqueOf):
+                    if uniqueOf[matId] in offsets:
+                        output.writelines(replicateBlock(readBlock(uniqueOf[matId]), uniqueOf[matId], (matId,)))
+    except (RuntimeError, ValueError):
+        os.remove(outputPath + '.tmp')
+        raise
+    finally:
+        if spill is not None:
+            spill.close()
+            os.remove(spillPath)
+
+    # Every material of the batches should appear in results
+    missing = [matId for matId in range(1, total + 1) if matId not in seen]
+    if missing:
+        os.remove(outputPath + '.tmp')
+        raise RuntimeError("Results of {:d} materials are missing, like MAT{:d}.".format(len(missing), missing[0]))
+    os.replace(outputPath + '.tmp', outputPath)
+
+    return {'batches': len(batches), 'materials': len(seen)}
+
+
+if __name__ == '__main__':
+    merge(jobName='div_0407', outputPath=os.path.join(os.getcwd(), 'div_0407', 'TPmate.out'))
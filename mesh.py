@@ -0,0 +1,254 @@
+"""
+Estimate of the axial meshing of core
+
+AxialMesh estimates, before the core is built, the axial meshes that Core.meshing()
+gives under a tolerance, so that the tolerance can be chosen for a number of meshes
+or a boundary shift. Core.meshing() still meshes the core by itself; nothing here is
+handed to pySARAX.
+
+The axial boundaries of every section in every assembly are collected into one array
+and sorted once. The boundaries of an assembly are computed from the heights of its
+sections and the reference plane recorded by assemblies.setRefPlane() (shifted by
+assemblies.shiftAssemb()).
+
+From the lowest boundary upward, the boundaries within the tolerance of the first one
+of a cluster are merged into one plane at the middle of the cluster, so that a chain
+of small gaps is NOT merged as a whole and no boundary shifts more than half of the
+tolerance. This rule is assumed for Core.meshing() but NOT verified against pySARAX,
+so the numbers of meshes & shifts are estimates; check them on the built core.
+The merged planes are NOT passed to pySARAX, whose mesh of a built core could NOT be
+read back either, so nothing is kept here for assigning the sections to the planes.
+"""
+import numpy as np
+
+# Number of bisections of tolerance before stepping to the exact merging change
+BISECTIONS = 50
+
+
+def axialBounds(assembly) -> np.ndarray:
+    """
+    Get the axial boundaries of sections in assembly, from bottom to top
+
+    Input
+    -----
+    assembly: Assembly, whose reference plane is recorded by assemblies.setRefPlane(),
+              or whose fixedBounds is given, like the blank assembly
+    """
+    if hasattr(assembly, 'nominalRefPlane'):
+        idx, offset = assembly.nominalRefPlane
+        heights = np.array([sec.height for sec in assembly.sections], dtype=float)
+        bounds = np.concatenate(([0.], np.cumsum(heights)))
+        return bounds + (offset + getattr(assembly, 'axialShift', 0.) - bounds[idx])
+    elif hasattr(assembly, 'fixedBounds'):
+        return np.array(assembly.fixedBounds, dtype=float)
+    else:
+        raise ValueError("The axial position of assembly {} is NOT recorded.".format(assembly))
+
+
+def clusterStarts(bounds, tolerance) -> np.ndarray:
+    """
+    The indices of the first boundaries of clusters merged under the tolerance
+    """
+    starts = []
+    start = 0
+    while start < len(bounds): # One step per plane
+        starts.append(start)
+        end = int(np.searchsorted(bounds, bounds[start] + tolerance, side='right'))
+        # The distances themselves are compared, as nextTolerance() gives them
+        while end < len(bounds) and bounds[end] - bounds[start] <= tolerance:
+            end += 1
+        while end - 1 > start and bounds[end-1] - bounds[start] > tolerance:
+            end -= 1
+        start = end
+    return np.array(starts, dtype=int)
+
+
+def nextTolerance(bounds, tolerance) -> float:
+    """
+    The smallest tolerance above tolerance, at which the merging of sorted boundaries changes
+
+    Only the first boundary of the next cluster may join a cluster, so the neighbouring
+    clusters are scanned, instead of the distances between any two boundaries.
+    Return inf if all boundaries are merged into one plane.
+    """
+    starts = clusterStarts(bounds, tolerance)
+    if len(starts) < 2:
+        return np.inf
+    return float((bounds[starts[1:]] - bounds[starts[:-1]]).min())
+
+
+def mergeBounds(bounds, tolerance) -> tuple:
+    """
+    Merge the sorted boundaries under the tolerance
+
+    Input
+    -----
+    bounds: np.ndarray, the unique boundaries in ascending order
+    tolerance: float, the boundaries within tolerance of the first one of a cluster are merged
+
+    Return
+    ------
+    (planes, labels), where labels[i] is the index of plane which bounds[i] is merged into
+    """
+    starts = clusterStarts(bounds, tolerance)
+    ends = np.concatenate((starts[1:], [len(bounds)])) - 1
+    labels = np.repeat(np.arange(len(starts)), ends - starts + 1)
+    planes = 0.5 * (bounds[starts] + bounds[ends])
+
+    return planes, labels
+
+
+def worstShift(bounds, tolerance) -> float:
+    """
+    The largest shift of the sorted boundaries merged under the tolerance, an estimate
+    """
+    if len(bounds) == 0:
+        return 0.
+    planes, labels = mergeBounds(bounds, tolerance)
+    return float(np.abs(planes[labels] - bounds).max())
+
+
+class AxialMesh:
+
+    def __init__(self, lattice, tolerance=0.1) -> None:
+        """
+        Estimate the axial meshes of core lattice
+
+        Input
+        -----
+        lattice: list, the core lattice, like core.lattice
+        tolerance: float, the meshing tolerance of Core.meshing()
+        """
+        # The shared assemblies (like dummy & blank) are counted once
+        assemblies = {id(assembly): assembly for ring in lattice for assembly in ring}.values()
+        self.bounds = np.unique(np.concatenate([axialBounds(assembly) for assembly in assemblies]))
+        self.remesh(tolerance)
+
+    def remesh(self, tolerance):
+        """
+        Merge the boundaries again under another tolerance, reusing the sorted boundaries
+        """
+        self.tolerance = tolerance
+        self.planes, self.labels = mergeBounds(self.bounds, tolerance)
+
+    @property
+    def count(self) -> int:
+        """
+        The estimated number of axial meshes
+        """
+        return len(self.planes) - 1
+
+    @property
+    def shifts(self) -> np.ndarray:
+        """
+        The estimated shift of every boundary merged into its plane
+        """
+        return np.abs(self.planes[self.labels] - self.bounds)
+
+    @property
+    def worstShift(self) -> float:
+        return worstShift(self.bounds, self.tolerance)
+
+    @property
+    def span(self) -> float:
+        """
+        The distance between the lowest & highest boundaries, which merges all of them
+        """
+        return float(self.bounds[-1] - self.bounds[0])
+
+    def toleranceForCount(self, maxCount) -> float:
+        """
+        The smallest tolerance giving at most maxCount axial meshes, estimated
+
+        The number of meshes never increases with tolerance, so the tolerance is bisected
+        first, then stepped by nextTolerance() to the exact point where the merging changes.
+        """
+        if maxCount < 0:
+            raise ValueError("The number of meshes {:d} is NOT valid.".format(maxCount))
+
+        def feasible(tolerance):
+            return len(clusterStarts(self.bounds, tolerance)) - 1 <= maxCount
+
+        low, high = 0., self.span # low is NOT feasible, high is
+        if feasible(low):
+            return low
+        for _ in range(BISECTIONS):
+            mid = 0.5 * (low + high)
+            if feasible(mid):
+                high = mid
+            else:
+                low = mid
+        tolerance = low
+        while not feasible(tolerance):
+            tolerance = nextTolerance(self.bounds, tolerance)
+        return tolerance
+
+    def toleranceForShift(self, maxShift) -> float:
+        """
+        The largest tolerance shifting no boundary more than maxShift, estimated
+
+        The worst shift never decreases with tolerance, so the tolerance is bisected from
+        2*maxShift, which shifts no boundary more than maxShift, then stepped by
+        nextTolerance() while the merging still satisfies maxShift.
+        If all boundaries are merged within maxShift, the span of boundaries is returned.
+        """
+        def feasible(tolerance):
+            return worstShift(self.bounds, tolerance) <= maxShift
+
+        low, high = 0., self.span # low is feasible, high is NOT
+        if feasible(high):
+            return high
+        if 2. * maxShift < high and feasible(2. * maxShift): # Unless the middle planes are rounded
+            low = 2. * maxShift
+        for _ in range(BISECTIONS):
+            mid = 0.5 * (low + high)
+            if feasible(mid):
+                low = mid
+            else:
+                high = mid
+        tolerance = low
+        while True:
+            candidate = nextTolerance(self.bounds, tolerance)
+            if candidate >= high or not feasible(candidate):
+                return tolerance
+            tolerance = candidate
+
+    def adapt(self, maxCount=None, maxShift=None) -> dict:
+        """
+        Search the tolerance for a maximum number of meshes and/or a maximum boundary shift, then remesh
+
+        The count & worst shift returned are those of the estimate, checked against the
+        limits here, NOT those of the core meshed by Core.meshing(), which could NOT be read
+        from pySARAX; compare them with the built core before relying on the tolerance.
+
+        Input
+        -----
+        maxCount: int, the maximum number of axial meshes
+        maxShift: float, the maximum shift of boundary in cm
+
+        With maxCount, the smallest tolerance satisfying it is chosen, which is the most accurate.
+        With maxShift only, the largest tolerance satisfying it is chosen, which is the cheapest.
+
+        Return
+        ------
+        A dict like {'tolerance': 0.1, 'estimatedCount': 60, 'estimatedWorstShift': 0.05}
+        """
+        if maxCount is None and maxShift is None:
+            raise ValueError("Either maxCount or maxShift should be given.")
+
+        if maxCount is not None:
+            tolerance = self.toleranceForCount(maxCount)
+            if maxShift is not None and tolerance > self.toleranceForShift(maxShift):
+                raise ValueError("NO tolerance gives <= {:d} meshes with shift <= {} cm.".format(maxCount, maxShift))
+        else:
+            tolerance = self.toleranceForShift(maxShift)
+
+        self.remesh(tolerance)
+        if (maxCount is not None and self.count > maxCount) or (maxShift is not None and self.worstShift > maxShift):
+            raise RuntimeError("The estimate at tolerance {:.4f} cm is NOT within the limits: {}".format(tolerance, self))
+        print(self)
+
+        return {'tolerance': self.tolerance, 'estimatedCount': self.count, 'estimatedWorstShift': self.worstShift}
+
+    def __str__(self) -> str:
+        return "Estimated {:d} axial meshes from {:d} boundaries, tolerance {:.4f} cm, worst shift {:.4f} cm".format(self.count, len(self.bounds), self.tolerance, self.worstShift)
@@ -0,0 +1,116 @@
+"""
+Part-by-part output of TULIP & LAVENDER input cards
+
+pySARAX builds a whole card as one string by Core.toTULIP() & Core.toLAVENDER(),
+and Core has NO way to emit it assembly by assembly. So the peak memory of
+writing a card is still that of the whole card, and it could NOT be lowered here
+without changes in pySARAX.
+
+What is saved is every further copy of the card: it is cut into its parts
+(header, CONTROL, every geometry block, MATERIAL) on the fly, and the parts are
+written one by one to a file, optionally compressed by gzip, or handed to
+divider.divideStream() directly without writing & re-reading the full card.
+The string of card is released as soon as it is written.
+"""
+import gzip
+
+from card import TulipCard
+
+
+def openOutput(path, mode='w', compress=None):
+    """
+    Open a text file, which is compressed by gzip if compress is True or the path ends with '.gz'
+    """
+    if compress is None:
+        compress = path.endswith('.gz')
+    if compress:
+        return gzip.open(path, mode + 't', encoding='utf-8', newline='')
+    return open(path, mode, encoding='utf-8', newline='')
+
+
+def iterCard(text):
+    """
+    Cut the text of TULIP card into parts without splitting it as a whole
+
+    Yield
+    -----
+    (part, chunk), where part is 'header', 'control', 'geometry' or 'material'.
+    Every geometry piece separated by two blank lines is a chunk of its own.
+    The keywords are yielded in the chunks of 'keyword', so that the chunks join into the original text.
+    """
+    posControl = text.index('CONTROL:')
+    posGeometry = text.index('GEOMETRY:', posControl)
+    posMaterial = text.index('MATERIAL:', posGeometry)
+
+    yield 'header', text[:posControl]
+    yield 'keyword', 'CONTROL:'
+    yield 'control', text[posControl + len('CONTROL:'):posGeometry]
+    yield 'keyword', 'GEOMETRY:'
+
+    start = posGeometry + len('GEOMETRY:')
+    while True:
+        end = text.find(TulipCard.GEOM_SEP, start, posMaterial)
+        if end < 0:
+            yield 'geometry', text[start:posMaterial]
+            break
+        yield 'geometry', text[start:end]
+        yield 'separator', TulipCard.GEOM_SEP
+        start = end + len(TulipCard.GEOM_SEP)
+
+    yield 'keyword', 'MATERIAL:'
+    yield 'material', text[posMaterial + len('MATERIAL:'):]
+
+
+def iterLines(text, size=1 << 20):
+    """
+    Cut a text into chunks of about size characters at line ends
+    """
+    start = 0
+    while start < len(text):
+        end = text.find('\n', start + size)
+        end = len(text) if end < 0 else end + 1
+        yield text[start:end]
+        start = end
+
+
+def writeStream(chunks, path, compress=None) -> int:
+    """
+    Write the chunks one by one
+
+    Input
+    -----
+    chunks: iterable, str or (part, str) from iterCard()
+    path: str, the output path
+    compress: bool, whether to compress by gzip, default to True if path ends with '.gz'
+
+    Return
+    ------
+    The number of characters written
+    """
+    size = 0
+    with openOutput(path, 'w', compress) as f:
+        for chunk in chunks:
+            if type(chunk) is tuple:
+                chunk = chunk[1]
+            f.write(chunk)
+            size += len(chunk)
+
+    return size
+
+
+def writeTULIP(core, path, compress=None) -> int:
+    """
+    Write the TULIP input card of core part by part
+
+    The whole card is still built in memory by Core.toTULIP(), see the module docstring.
+    """
+    return writeStream(iterCard(core.toTULIP()), path, compress)
+
+
+def writeLAVENDER(core, path, compress=None) -> int:
+    """
+    Write the LAVENDER input card of core chunk by chunk
+
+    The whole card is still built in memory by Core.toLAVENDER(), see the module docstring.
+    """
+    return writeStream(iterLines(core.toLAVENDER()), path, compress)
@@ -0,0 +1,173 @@
+"""
+Batched plotting of core lattice
+
+Core.plotRaial() & Core.plotAxial() of pySARAX draw every hexagon & section one by one
+into SVG. Here all hexagons (or axial rectangles) are drawn as one PolyCollection,
+colored by a category (like the type of assembly) or by a metric of every position.
+The format follows the extension of savePath, like '.png' for raster output.
+
+The figures are drawn by the object-oriented API of matplotlib (without pyplot),
+so that they can be pickled to a background process with background=True, which
+returns a Future instead of blocking the build. Only the artists are built in this
+process; the rendering & writing of file, which take most of the time, run in the
+other process free of the GIL.
+"""
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.collections import PolyCollection
+from matplotlib.patches import Patch
+from matplotlib import colormaps
+
+from lattice import RING_NUM, cubeCoords, flatten
+from mesh import axialBounds
+
+PITCH = 5.8929 # cm, the pitch of assembly
+LOCATION_PATTERN = re.compile(r'^\d{2}[A-F]\d{2} ')
+
+# A single process renders the figures in order, started at the first background plot
+_plotter = None
+
+
+def centers(ringNum=RING_NUM, pitch=PITCH) -> np.ndarray:
+    """
+    The (X, Y) of the centers of all positions in the order of flat index, shape (N, 2)
+    """
+    cube = cubeCoords(ringNum)
+    return pitch * np.stack((cube[:, 0] + 0.5 * cube[:, 2], np.sqrt(3) / 2 * cube[:, 2]), axis=-1)
+
+
+def hexagons(ringNum=RING_NUM, pitch=PITCH) -> np.ndarray:
+    """
+    The vertices of all hexagons, shape (N, 6, 2)
+    """
+    angles = np.deg2rad(30 + 60 * np.arange(6))
+    vertices = pitch / np.sqrt(3) * np.stack((np.cos(angles), np.sin(angles)), axis=-1)
+    return centers(ringNum, pitch)[:, None, :] + vertices[None, :, :]
+
+
+def typeLabels(lattice) -> list:
+    """
+    The type name of assembly at every position in the order of flat index
+    """
+    return [getattr(assembly, 'typeName', type(assembly).__name__) for assembly in flatten(lattice)]
+
+
+def sectionLabel(section) -> str:
+    """
+    The name of section without its location, like 'driver slug1' for '01A01 driver slug1'
+    """
+    return LOCATION_PATTERN.sub('', getattr(section, 'name', type(section).__name__))
+
+
+def colorize(collection, ax, labels=None, values=None, cmap='viridis', title=None):
+    """
+    Color the collection by categories or by values, and add the legend or colorbar
+    """
+    if values is not None:
+        collection.set_array(np.asarray(values, dtype=float))
+        collection.set_cmap(cmap)
+        ax.figure.colorbar(collection, ax=ax, label=title)
+    else:
+        categories, codes = np.unique(np.asarray(labels), return_inverse=True)
+        palette = colormaps['tab20'].resampled(max(len(categories), 1))
+        collection.set_facecolor(palette(codes))
+        handles = [Patch(facecolor=palette(idx), label=category) for idx, category in enumerate(categories)]
+        ax.legend(handles=handles, loc='center left', bbox_to_anchor=(1.0, 0.5), fontsize='small', frameon=False)
+
+
+def save(fig, savePath, dpi):
+    fig.savefig(savePath, dpi=dpi, bbox_inches='tight')
+    return savePath
+
+
+def submit(fig, savePath, dpi, background):
+    global _plotter
+
+    if background:
+        if _plotter is None:
+            _plotter = ProcessPoolExecutor(max_workers=1)
+        return _plotter.submit(save, fig, savePath, dpi)
+    return save(fig, savePath, dpi)
+
+
+def plotRadial(lattice, savePath, values=None, labels=None, title=None, cmap='viridis', dpi=150, background=False):
+    """
+    Plot the radial layout of core lattice
+
+    Input
+    -----
+    lattice: list, the core lattice
+    savePath: str, the output path, like 'radial.png' or 'radial.svg'
+    values: ArrayLike, a metric of every position in the order of flat index, like the U235 mass
+    labels: ArrayLike, the category of every position, default to the type of assembly
+    background: bool, whether to render in the background process, returning a Future
+    """
+    ringNum = len(lattice)
+    if values is None and labels is None:
+        labels = typeLabels(lattice)
+
+    fig = Figure(figsize=(9, 8))
+    ax = fig.add_subplot()
+    collection = PolyCollection(hexagons(ringNum), edgecolors='k', linewidths=0.2)
+    ax.add_collection(collection)
+    colorize(collection, ax, labels, values, cmap, title)
+
+    extent = PITCH * ringNum
+    ax.set_xlim(-extent, extent)
+    ax.set_ylim(-extent, extent)
+    ax.set_aspect('equal')
+    ax.set_xlabel('X (cm)')
+    ax.set_ylabel('Y (cm)')
+    if title is not None:
+        ax.set_title(title)
+
+    return submit(fig, savePath, dpi, background)
+
+
+def plotAxial(lattice, savePath, row=None, values=None, title=None, cmap='viridis', dpi=150, background=False):
+    """
+    Plot the axial sections of the positions along a row of core lattice
+
+    Input
+    -----
+    lattice: list, the core lattice
+    savePath: str, the output path
+    row: ArrayLike, the flat indices of positions, default to the row through center along X
+    values: callable, section -> float, a metric to color by, otherwise colored by section name
+    background: bool, whether to render in the background process, returning a Future
+    """
+    ringNum = len(lattice)
+    xy = centers(ringNum)
+    if row is None:
+        row = np.flatnonzero(np.isclose(xy[:, 1], 0.))
+    row = np.asarray(row)[np.argsort(xy[row, 0])]
+    items = flatten(lattice)
+
+    rectangles, sections = [], []
+    for idx in row:
+        assembly = items[idx]
+        bounds = axialBounds(assembly)
+        left, right = xy[idx, 0] - PITCH / 2, xy[idx, 0] + PITCH / 2
+        for sec, (low, high) in zip(assembly.sections, zip(bounds[:-1], bounds[1:])):
+            rectangles.append(((left, low), (right, low), (right, high), (left, high)))
+            sections.append(sec)
+
+    fig = Figure(figsize=(12, 8))
+    ax = fig.add_subplot()
+    collection = PolyCollection(rectangles, edgecolors='k', linewidths=0.1)
+    ax.add_collection(collection)
+    if values is not None:
+        colorize(collection, ax, values=[values(sec) for sec in sections], cmap=cmap, title=title)
+    else:
+        colorize(collection, ax, labels=[sectionLabel(sec) for sec in sections])
+
+    ax.autoscale_view()
+    ax.set_xlabel('X (cm)')
+    ax.set_ylabel('Z (cm)')
+    if title is not None:
+        ax.set_title(title)
+
+    return submit(fig, savePath, dpi, background)
@@ -0,0 +1,134 @@
+"""
+Incremental rebuild of core lattice
+
+Between burnup steps or benchmark revisions only a few CSV material files change,
+while buildLattice() rebuilds the slug sections of all 721 positions.
+LatticeBuilder records what every position depends on:
+    location, assembly type, MK type, CSV material file (by SHA1), the section templates
+    & the installed pySARAX (see sectioncache.packageHash())
+and keeps the slug sections of every position in a cache file,
+so that only the slug sections of positions whose dependencies changed are rebuilt.
+
+The rebuild is only partly incremental. The Assembly objects of all positions are still
+created from the cached sections, and buildCore() still completes & meshes the whole core,
+since pySARAX has NO way to update a built core in place. The positions rebuilt are reported
+by LatticeBuilder.changed, and the affected parts of TULIP card are picked out downstream by
+divider.divide(..., incremental=True), which rewrites only the batches whose blocks changed.
+"""
+import os
+import pickle
+import hashlib
+
+from assemblies import *
+from sectioncache import fileHash, templateHash, packageHash
+
+CACHE_NAME = 'lattice.cache'
+
+
+class LatticeBuilder:
+
+    def __init__(self, cachePath=None, ringNum=16) -> None:
+        """
+        Input
+        -----
+        cachePath: str, the path of cache file, default to "./output/lattice.cache"
+        ringNum: int, the number of rings in core lattice
+        """
+        if cachePath is None:
+            cachePath = os.path.join(os.getcwd(), 'output', CACHE_NAME)
+        self.cachePath = cachePath
+        self.ringNum = ringNum
+        self.template = templateHash()
+        self.package = packageHash()
+        self.cache = self.load()    # location -> (key, slug sections)
+        self.csvPaths = None        # location -> path of CSV material file
+        self.changed = []           # the locations rebuilt by the last build()
+
+    def load(self) -> dict:
+        if not os.path.exists(self.cachePath):
+            return dict()
+        try:
+            with open(self.cachePath, 'rb') as f:
+                return pickle.load(f)
+        except (pickle.UnpicklingError, EOFError, AttributeError, ImportError) as err:
+            print("Cache {} is NOT readable, rebuild all: {}".format(self.cachePath, err))
+            return dict()
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.cachePath), exist_ok=True)
+        with open(self.cachePath + '.tmp', 'wb') as f:
+            pickle.dump(self.cache, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(self.cachePath + '.tmp', self.cachePath)
+
+    def findCsv(self, location) -> str:
+        """
+        Find the CSV material file at given location, walking the directory only once
+        """
+        if self.csvPaths is None:
+            self.csvPaths = dict()
+            for root, dirs, files in os.walk(slugmat.path):
+                for file in files:
+                    if 'csv' in file:
+                        self.csvPaths[file.split('.')[0]] = os.path.join(root, file)
+        return self.csvPaths.get(location)
+
+    def dependencies(self, position) -> dict:
+        """
+        Get the dependencies of assembly at given position (r, k)
+        """
+        location, assemblyType, MKType = locateAssemb(position)
+        deps = {'location': location, 'type': assemblyType, 'MKType': MKType, 'csv': None}
+
+        # The assemblies without fuel slug are shared & cheap, so they are NOT cached
+        slugType = experimentalType(location) if assemblyType == 'experimental' else assemblyType
+        if slugType not in noSlugTypes:
+            csvPath = self.findCsv(location)
+            deps['csv'] = fileHash(csvPath) if csvPath is not None else None
+            deps['template'] = self.template
+            deps['package'] = self.package
+
+        return deps
+
+    @staticmethod
+    def key(deps) -> str:
+        return hashlib.sha1(repr(sorted(deps.items())).encode('utf-8')).hexdigest()
+
+    def build(self) -> list:
+        """
+        Build the core lattice, rebuilding the slug sections only if their dependencies changed
+        """
+        assembNum = lambda r: 6 * r if r > 0 else 1
+        lattice = []
+        self.changed = []
+
+        for r in range(self.ringNum):
+            ring = []
+            for k in range(assembNum(r)):
+                deps = self.dependencies((r, k))
+                location, assemblyType, MKType = deps['location'], deps['type'], deps['MKType']
+
+                if 'template' not in deps:
+                    assembly = buildAssemb(assemblyType, location, MKType)
+                else:
+                    key = self.key(deps)
+                    if location not in self.cache or self.cache[location][0] != key:
+                        fuelSlugs.release(location) # Read the CSV file again
+                        self.cache[location] = (key, buildSlugs(assemblyType, location))
+                        self.changed.append(location)
+                        print("Assembly [{}, {}, {}] rebuilt.".format((r+1, k+1), location, assemblyType))
+                    assembly = buildAssemb(assemblyType, location, MKType, slugSecs=self.cache[location][1])
+                ring.append(assembly)
+
+            lattice.append(ring)
+
+        if self.changed:
+            self.save()
+        print("{:d} assemblies rebuilt.".format(len(self.changed)))
+
+        return lattice
+
+
+if __name__ == '__main__':
+    builder = LatticeBuilder()
+    lattice = builder.build()
+    print(builder.changed)
@@ -0,0 +1,227 @@
+"""
+Run the divided TULIP cards on local workstation
+
+Every batch recorded in "./@JOB_NAME/manifest.txt" is solved by a command
+under a concurrency limit. The progress is tracked in "./@JOB_NAME/status.txt",
+so that an interrupted job could be resumed and the failed batches retried.
+"""
+import os
+import sys
+import time
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from divider import divide, readManifest, materialize, DRIVER_NAME
+
+STATUS_NAME = 'status.txt'
+LOG_NAME = 'run.log'
+
+# The return codes of batches that timed out or could NOT be started
+TIMEOUT_CODE = -1
+ERROR_CODE = -2
+
+# Solve a batch by the job-array driver, in which LoongSARAX is called
+DEFAULT_COMMAND = ('bash', os.path.join('{jobDir}', DRIVER_NAME), '{cardId}')
+
+
+# ###################################################
+#                      Status
+# ###################################################
+def readStatus(jobName) -> dict:
+    """
+    Read the status of batches recorded in "./@JOB_NAME/status.txt"
+
+    Return
+    ------
+    A dict mapping cardId to its status, like {0: {'status': 'done', 'attempts': 1, 'elapsed': 12.3, 'hash': '3f7a...'}}
+    The hash is the one of the batch card when it was solved.
+    """
+    path = os.path.join(os.getcwd(), jobName, STATUS_NAME)
+    status = {}
+    if not os.path.exists(path):
+        return status
+
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.startswith('!') or not line.strip():
+                continue
+            fields = line.split()
+            status[int(fields[0])] = {
+                'status': fields[1],
+                'attempts': int(fields[2]),
+                'elapsed': float(fields[3]),
+                'hash': fields[4] if len(fields) > 4 else None
+            }
+
+    return status
+
+
+def writeStatus(jobName, status):
+    """
+    Write the status of batches into "./@JOB_NAME/status.txt"
+
+    The file is replaced atomically, so an interruption never leaves a broken status.
+    """
+    path = os.path.join(os.getcwd(), jobName, STATUS_NAME)
+    lines = ['{:<10}{:<10}{:<10}{:<12}{}'.format('!cardId', 'status', 'attempts', 'elapsed', 'hash')]
+    for cardId in sorted(status.keys()):
+        s = status[cardId]
+        lines.append('{:<10d}{:<10}{:<10d}{:<12.3f}{}'.format(cardId, s['status'], s['attempts'], s['elapsed'], s['hash']))
+
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
+    os.replace(path + '.tmp', path)
+
+
+# ###################################################
+#                      Runner
+# ###################################################
+def runBatch(info, jobName, command, timeout=None) -> tuple:
+    """
+    Solve a single batch in its own directory
+
+    Input
+    -----
+    info: dict, the batch recorded in manifest
+    jobName: str, the name of job
+    command: ArrayLike, the solver command, in which '{jobDir}', '{matDir}' & '{cardId}' are replaced
+    timeout: float, the time limit of the command in seconds
+
+    Return
+    ------
+    (returncode, elapsed), where returncode is TIMEOUT_CODE on timeout,
+    or ERROR_CODE if the command could NOT be run
+    """
+    jobDir = os.path.join(os.getcwd(), jobName)
+    path = os.path.join(jobDir, info['matDir'])
+    args = [str(arg).format(jobDir=jobDir, matDir=info['matDir'], cardId=info['cardId']) for arg in command]
+
+    env = dict(os.environ)
+    env['JOB_NAME'] = jobName
+    env['JOB_DIR'] = jobDir
+    env['MAT_ID'] = info['matDir']
+
+    start = time.perf_counter()
+    with open(os.path.join(path, LOG_NAME), 'w', encoding='utf-8') as log:
+        try:
+            # The card of compact division is materialized only when it is run
+            materialize(jobName, info['matDir'])
+            returncode = subprocess.run(args, cwd=path, env=env, stdout=log, stderr=subprocess.STDOUT, timeout=timeout).returncode
+        except subprocess.TimeoutExpired:
+            log.write('\nTimeout after {} s\n'.format(timeout))
+            returncode = TIMEOUT_CODE
+        except (OSError, subprocess.SubprocessError) as err:
+            # Like a solver NOT found, which fails the batch instead of the whole run
+            log.write('\nFailed to run {}: {}\n'.format(' '.join(args), err))
+            returncode = ERROR_CODE
+
+    return returncode, time.perf_counter() - start
+
+
+def run(jobName, command=DEFAULT_COMMAND, maxWorkers=None, retries=1, timeout=None) -> dict:
+    """
+    Run all batches of the job under a concurrency limit
+
+    The batches already done are skipped, so calling run() again resumes an interrupted job.
+    A done batch is solved again if its card has been changed by an incremental re-division.
+
+    Input
+    -----
+    jobName: str, the name of job divided by divider.py
+    command: ArrayLike, the solver command, like ('python', 'fakeSolver.py'), see runBatch()
+    maxWorkers: int, the maximum number of concurrent batches, default to the CPU count
+    retries: int, the times of retrying a failed batch
+    timeout: float, the time limit of every batch in seconds
+
+    Return
+    ------
+    A dict reporting the run, containing the numbers of batches & materials, wall time and throughput
+    """
+    batches = readManifest(jobName)
+    status = readStatus(jobName)
+    maxWorkers = maxWorkers or os.cpu_count()
+
+    # Resume: only the batches NOT done with the current card are submitted
+    def isDone(info):
+        s = status.get(info['cardId'], {})
+        return s.get('status') == 'done' and (info['hash'] is None or s.get('hash') == info['hash'])
+
+    pending = [info for info in batches if not isDone(info)]
+    for info in pending:
+        status[info['cardId']] = {'status': 'pending', 'attempts': 0, 'elapsed': 0., 'hash': info['hash']}
+    writeStatus(jobName, status)
+
+    start = time.perf_counter()
+    solved, failed = [], []
+    with ThreadPoolExecutor(max_workers=maxWorkers) as executor:
+        futures = {}
+        for info in pending:
+            futures[executor.submit(runBatch, info, jobName, command, timeout)] = info
+            status[info['cardId']]['status'] = 'running'
+
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                info = futures.pop(future)
+                s = status[info['cardId']]
+                returncode, elapsed = future.result()
+                s['attempts'] += 1
+                s['elapsed'] += elapsed
+
+                if returncode == 0:
+                    s['status'] = 'done'
+                    solved.append(info)
+                elif s['attempts'] <= retries:
+                    print("Batch [{}] failed with code {:d}, retrying ({:d}/{:d}).".format(info['matDir'], returncode, s['attempts'], retries))
+                    futures[executor.submit(runBatch, info, jobName, command, timeout)] = info
+                else:
+                    s['status'] = 'failed'
+                    failed.append(info)
+                    print("Batch [{}] failed with code {:d}.".format(info['matDir'], returncode))
+
+            writeStatus(jobName, status)
+
+    wallTime = time.perf_counter() - start
+    matNum = sum(info['endId'] - info['startId'] + 1 for info in solved)
+    report = {
+        'batches': len(solved),
+        'failed': len(failed),
+        'skipped': len(batches) - len(pending),
+        'materials': matNum,
+        'wallTime': wallTime,
+        'batchesPerSec': len(solved) / wallTime if wallTime > 0 else 0.,
+        'materialsPerSec': matNum / wallTime if wallTime > 0 else 0.
+    }
+    print("Job [{}]: {:d} batches ({:d} materials) solved, {:d} failed, {:d} skipped in {:.2f} s, {:.3f} batches/s, {:.3f} materials/s".format(
+        jobName, report['batches'], report['materials'], report['failed'], report['skipped'],
+        report['wallTime'], report['batchesPerSec'], report['materialsPerSec']
+    ))
+
+    return report
+
+
+def benchmark(jobName, cardPath, batchSizes, command=DEFAULT_COMMAND, maxWorkers=None) -> dict:
+    """
+    Measure the wall time of dividing & solving a card with different batch sizes
+
+    Every batch size is divided into its own job "@JOB_NAME_bs@BATCH_SIZE".
+
+    Return
+    ------
+    A dict mapping batch size to the report of run()
+    """
+    reports = {}
+    for batchSize in batchSizes:
+        subJob = '{}_bs{:d}'.format(jobName, batchSize)
+        start = time.perf_counter()
+        divide(jobName=subJob, cardPath=cardPath, batchSize=batchSize, shell=command is DEFAULT_COMMAND)
+        divideTime = time.perf_counter() - start
+
+        reports[batchSize] = run(jobName=subJob, command=command, maxWorkers=maxWorkers, retries=0)
+        reports[batchSize]['divideTime'] = divideTime
+
+    return reports
+
+
+if __name__ == '__main__':
+    run(jobName=sys.argv[1] if len(sys.argv) > 1 else 'div_0407', maxWorkers=4)
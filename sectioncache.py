@@ -0,0 +1,183 @@
+"""
+Content-addressed cache of slug sections on disk
+
+buildSec() gives the same sections for the same location, section type, slug
+composition, section templates (the geometry constants & structure materials in
+materials.py, sections.py & assemblies.py) and pySARAX. The built sections are
+pickled under the SHA1 of all of them, like "./output/sections/3f/3fa4...e1.pkl",
+together with whatever pySARAX keeps in them. pySARAX is identified by its version
+and the content of its installed files, so an upgrade or a rebuilt library in place
+does NOT reuse the sections pickled by the old one.
+
+Every file is written to a temporary file and then renamed, so the processes of
+sweep.py and repeated builds can share one cache directory. The files used least
+recently are removed once the directory exceeds its size limit.
+"""
+import os
+import pickle
+import hashlib
+import importlib
+
+import numpy as np
+
+from sections import buildSec
+
+TEMPLATE_FILES = ('materials.py', 'sections.py', 'assemblies.py')
+PACKAGE_EXTENSIONS = ('.py', '.pyd', '.so', '.dll')
+
+
+def fileHash(path) -> str:
+    """
+    The SHA1 of file content
+    """
+    sha = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def templateHash() -> str:
+    """
+    The SHA1 of the section templates, which all slug sections depend on
+    """
+    sha = hashlib.sha1()
+    root = os.path.dirname(os.path.abspath(__file__))
+    for fileName in TEMPLATE_FILES:
+        sha.update(fileHash(os.path.join(root, fileName)).encode('utf-8'))
+    return sha.hexdigest()
+
+
+def packageHash(package='pySARAX') -> str:
+    """
+    The SHA1 of the version & installed files of package, which sections are built by
+    """
+    module = importlib.import_module(package)
+    sha = hashlib.sha1()
+    sha.update(repr(getattr(module, '__version__', None)).encode('utf-8'))
+
+    if hasattr(module, '__path__'):
+        paths = []
+        for directory in module.__path__:
+            for root, dirs, names in os.walk(directory):
+                dirs.sort()
+                paths += [os.path.join(root, name) for name in sorted(names) if name.endswith(PACKAGE_EXTENSIONS)]
+    else:
+        paths = [module.__file__]
+    for path in paths:
+        sha.update(fileHash(path).encode('utf-8'))
+    return sha.hexdigest()
+
+
+class SectionCache:
+
+    def __init__(self, cacheDir=None, maxBytes=1 << 30) -> None:
+        """
+        Input
+        -----
+        cacheDir: str, the directory of cache, default to "./output/sections"
+        maxBytes: int, the size limit of cache directory in bytes
+        """
+        if cacheDir is None:
+            cacheDir = os.path.join(os.getcwd(), 'output', 'sections')
+        self.cacheDir = cacheDir
+        self.maxBytes = maxBytes
+        self.template = templateHash()
+        self.package = packageHash()
+        self.size = self.scan()[1]
+        self.hits, self.misses = 0, 0
+
+    def key(self, location, secType, slugMats) -> str:
+        """
+        The SHA1 of location, section type, slug compositions, section templates & pySARAX
+        """
+        sha = hashlib.sha1()
+        sha.update(repr((location, secType, self.template, self.package)).encode('utf-8'))
+        for mat in slugMats:
+            sha.update(np.ascontiguousarray(mat['ZAIDS'].to_numpy(dtype=np.int64)).tobytes())
+            sha.update(np.ascontiguousarray(mat['Density'].to_numpy(dtype=np.float64)).tobytes())
+        return sha.hexdigest()
+
+    def path(self, key) -> str:
+        return os.path.join(self.cacheDir, key[:2], key + '.pkl')
+
+    def scan(self) -> tuple:
+        """
+        The cache files from the least recently used, and their total size
+
+        Return
+        ------
+        ([(time, size, path), ...], total size)
+        """
+        files = []
+        for root, dirs, names in os.walk(self.cacheDir):
+            for name in names:
+                if name.endswith('.pkl'):
+                    try:
+                        stat = os.stat(os.path.join(root, name))
+                    except FileNotFoundError: # Removed by another process
+                        continue
+                    files.append((stat.st_mtime, stat.st_size, os.path.join(root, name)))
+        files.sort()
+        return files, sum(size for _, size, _ in files)
+
+    def get(self, key):
+        """
+        The sections under key, None if NOT cached
+        """
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as f:
+                secs = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except (pickle.UnpicklingError, EOFError, AttributeError, ImportError) as err:
+            print("Cache {} is NOT readable, rebuild it: {}".format(path, err))
+            return None
+
+        try:
+            os.utime(path) # Mark as recently used
+        except FileNotFoundError:
+            pass
+        return secs
+
+    def put(self, key, secs):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmpPath = '{}.{:d}.tmp'.format(path, os.getpid())
+        with open(tmpPath, 'wb') as f:
+            pickle.dump(secs, f, protocol=pickle.HIGHEST_PROTOCOL)
+        self.size += os.path.getsize(tmpPath)
+        os.replace(tmpPath, path)
+
+        if self.size > self.maxBytes:
+            self.evict()
+
+    def evict(self):
+        """
+        Remove the least recently used files until the cache is within 90% of its size limit
+        """
+        files, self.size = self.scan() # Including the files of other processes
+        for _, size, path in files:
+            if self.size <= 0.9 * self.maxBytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self.size -= size
+
+    def build(self, location, secType, slugMats) -> tuple:
+        """
+        Get the sections of buildSec() from cache, or build & cache them
+        """
+        key = self.key(location, secType, slugMats)
+        secs = self.get(key)
+        if secs is not None:
+            self.hits += 1
+            return secs
+
+        self.misses += 1
+        secs = buildSec(location, secType, slugMats)
+        self.put(key, secs)
+        return secs
@@ -13,6 +13,10 @@ File Log:
 2023-1-30   buildSec() created
 2023-1-31   HWD completed
 2023-2-1    Control, HWCR, safety & dummy completed
+2026-10-19  Average fuel slug built by assemblies.buildAvgSlug()
+2026-10-19  fuelSlugs kept in SlugStore
+2026-10-19  Structures of HWD rings mixed once by _mixHwdRings()
+2026-10-19  Geometry of HWD rings memoized by pinRingShares()
 """
 import os
 import sys
@@ -27,6 +31,7 @@ sys.path.append(PYSARAX_PATH[getuser()])
 
 import numpy as np
 from copy import copy
+from functools import lru_cache
 from pySARAX import Section
 from materials import *
 
@@ -147,30 +152,14 @@ def buildSec(location, secType, slugMats) -> tuple:
             slug.fromDataFrame(slugMats[idx])
 
             # Build the section, from inner to outer
+            # The structures of every ring are mixed in advance, see _mixHwdRings()
             sec = Section(name=secName, ring=ring, pitch=0.5655, eqMethod='1-D')
-            cumulativeArea = 0.
-            for r in range(ring):
-                steelNum = steelNumbers[r]                                   # The number of SS304 rod
-                fuelNum = rodNumber(r) - steelNum                            # The number of fuel rod
-                
-                totalCoef = rodNumber(r) * cellArea                          # Area of current ring
-                fuelCoef = fuelNum * fuelArea                                # Area of fuel region
-                steelCoef = fuelNum * cladArea + steelNum * steelArea        # Area of SS304 region
-                wireCoef = rodNumber(r) * wireArea                           # Area of wire wrap region
-                sodiumCoef = totalCoef - (fuelCoef + steelCoef + wireCoef)   # Area of sodium region
-
-                eqPitch = np.sqrt((totalCoef + cumulativeArea) * 4 * np.sqrt(3) / 6)
-                # print(r)
-                # print(slug.composition)
-                # print(fuelCoef)
-                # print((fuelCoef * slug).composition)
-                eqMat = (1 / totalCoef) * (fuelCoef * slug + steelCoef * ss304 + wireCoef * wireWrap + sodiumCoef * sodium)
+            for r, (eqPitch, fuelShare, structure) in enumerate(_hwdRings):
+                eqMat = fuelShare * slug + structure
                 eqMat.name = 'HWD {} Slug{:d} Ring{:d}'.format(location, idx+1, r+1)
                 # print(idx, r)
                 # print(eqMat.composition.to_string())
                 sec.appendRegion(eqPitch, eqMat)
-
-                cumulativeArea += totalCoef
             
             # The outest regions surrounding the equivalent regions
             sec.appendRegion(5.6134, sodium)
@@ -260,22 +249,12 @@ def buildSec(location, secType, slugMats) -> tuple:
 assembLocPath = "C:\SJTUGraduate\Research\Projects\LoongSARAXVerif\code\model_ver2\\assembLocations.xlsx"
 assembLoc = pd.read_excel(assembLocPath)
 
-# # 均匀化燃料芯块(TODO)
-# avgFuelSlug = Section(name='average fuel slug', ring=6, pitch=0.5665, eqMethod='1-D')
-# avgFuelSlug.appendRod(0.3302, sodium) # Actually it should be avgFuelMat
-# avgFuelSlug.appendRod(0.3810, sodium)
-# avgFuelSlug.appendRod(0.4420, ss304)
-# avgFuelSlug.appendRod(0.4591, wireWrap)
-# avgFuelSlug.appendRegion(5.6134, sodium)
-# avgFuelSlug.appendRegion(5.8166, ss304)
-# avgFuelSlug.appendRegion(5.8929, sodium)
-# avgFuelSlug.height = 11.43
+# 均匀化燃料芯块: see assemblies.buildAvgSlug()
 
 # 燃料芯块逐组件详细组分
-fuelSlugs = []
-for location, assemblyType in slugmat.allLocations:
-    mats = slugmat.get(location)
-    fuelSlugs.append((location, assemblyType, mats))
+# The densities are kept compactly in SlugStore, use np.float32 to halve the memory
+fuelSlugs = SlugStore(slugmat, dtype=np.float64)
+fuelSlugs.load()
 
 blankSec = Section(name='blank')
 blankSec.appendRegion(5.8929, sodium)
@@ -432,14 +411,75 @@ ring = 6
 steelNumbers = (1, 2, 6, 10, 12, 14)
 rodNumber = lambda r: 6 * r if r > 0 else 1
 
-# Auxiliary: the areas of structures
-fuelArea = np.pi / 4 * 0.3302**2                   # Area of fuel rod
-gapArea = np.pi / 4 * 0.3810**2 - fuelArea         # Area of sodium gap
-cladArea = np.pi / 4 * 0.4420**2 - gapArea         # Area of SS304 cladding
-wireArea = np.pi / 4 * 0.4591**2 - cladArea        # Area of wire wrap
-steelArea =  np.pi / 4 * 0.4420**2                 # Area of SS304 dummy rod
+# Auxiliary: the diameters of fuel rod, sodium gap, SS304 cladding & wire wrap
+pinDiameters = (0.3302, 0.3810, 0.4420, 0.4591)
 cellPitch = 5.6134 / (3 * ring - 1) * np.sqrt(3)   # Pitch of pin cell
-cellArea = cellPitch**2 / 4 / np.sqrt(3) * 6       # Area of pin cell
+
+
+@lru_cache(maxsize=None)
+def pinRingShares(ringNum, pitch, diameters, steelNumbers) -> tuple:
+    """
+    The geometry-only part of the ring-by-ring equivalence of rods, memoized by its signature,
+    so that the assemblies of the same pin geometry do NOT compute it again
+
+    Input
+    -----
+    ringNum: int, the number of rod rings
+    pitch: float, the pitch of pin cell
+    diameters: tuple, the diameters of fuel rod, sodium gap, SS304 cladding & wire wrap
+    steelNumbers: tuple, the number of SS304 dummy rods in every ring
+
+    Return
+    ------
+    ((equivalent pitch, share of fuel, SS304, wire wrap & sodium), ...) of every ring
+    """
+    fuelDiameter, gapDiameter, cladDiameter, wireDiameter = diameters
+    fuelArea = np.pi / 4 * fuelDiameter**2             # Area of fuel rod
+    gapArea = np.pi / 4 * gapDiameter**2 - fuelArea    # Area of sodium gap
+    cladArea = np.pi / 4 * cladDiameter**2 - gapArea   # Area of SS304 cladding
+    wireArea = np.pi / 4 * wireDiameter**2 - cladArea  # Area of wire wrap
+    steelArea = np.pi / 4 * cladDiameter**2            # Area of SS304 dummy rod
+    cellArea = pitch**2 / 4 / np.sqrt(3) * 6           # Area of pin cell
+
+    rings = []
+    cumulativeArea = 0.
+    for r in range(ringNum):
+        steelNum = steelNumbers[r]                                   # The number of SS304 rod
+        fuelNum = rodNumber(r) - steelNum                            # The number of fuel rod
+
+        totalCoef = rodNumber(r) * cellArea                          # Area of current ring
+        fuelCoef = fuelNum * fuelArea                                # Area of fuel region
+        steelCoef = fuelNum * cladArea + steelNum * steelArea        # Area of SS304 region
+        wireCoef = rodNumber(r) * wireArea                           # Area of wire wrap region
+        sodiumCoef = totalCoef - (fuelCoef + steelCoef + wireCoef)   # Area of sodium region
+
+        eqPitch = np.sqrt((totalCoef + cumulativeArea) * 4 * np.sqrt(3) / 6)
+        rings.append((eqPitch, fuelCoef / totalCoef, steelCoef / totalCoef, wireCoef / totalCoef, sodiumCoef / totalCoef))
+
+        cumulativeArea += totalCoef
+
+    return tuple(rings)
+
+
+def _mixHwdRings() -> tuple:
+    """
+    Mix the structures (SS304, wire wrap & sodium) of every HWD ring, which do NOT
+    change among HWDs, so the slug of every HWD is added to them by one addition
+
+    Return
+    ------
+    ((equivalent pitch, share of fuel, mixed structures), ...) of every ring
+    """
+    rings = []
+    for r, (eqPitch, fuelShare, steelShare, wireShare, sodiumShare) in enumerate(pinRingShares(ring, cellPitch, pinDiameters, steelNumbers)):
+        structure = steelShare * ss304 + wireShare * wireWrap + sodiumShare * sodium
+        structure.name = 'HWD structures Ring{:d}'.format(r+1)
+        rings.append((eqPitch, fuelShare, structure))
+
+    return tuple(rings)
+
+
+_hwdRings = _mixHwdRings()
 
 
 # ###################################################
@@ -630,6 +670,7 @@ hwcrSecs['poisonSlug'].height = 35.56
 # hwcrSecs['poisonSlug'].scSection = buildSec('04A02', 'driver', slugmat.get(location=('04A02')))[0]
 hwcrSecs['poisonSlug'].scSection = driverSecs['upEx-MKII'] # Surrounding the poison in HWCR are upper extension and gas plenum
 # hwcrSecs['poisonSlug'].scSection = None # NEED to specify the surrounding assemblies of supercell
+# The real surroundings of every HWCR are specified by supercell.buildSupercells() after building lattice
 
 # # 7个HWCR周围组件的编号
 # hwcrSurroundings = {
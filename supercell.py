@@ -0,0 +1,113 @@
+"""
+Supercells of HWCR poison slugs from their real surroundings
+
+The poison slug of HWCR is homogenized by a supercell, whose surrounding section
+(Section.scSection) used to be driverSecs['upEx-MKII'] for all HWCRs.
+For every assembly holding the poison slug, the sections of its 6 neighbors at the
+middle height of poison slug are looked up by lattice.neighborTable(), and the most
+common one becomes the surrounding section.
+
+The poison sections are copied once per neighborhood, i.e. the sorted sections of the
+6 neighbors, so the HWCRs with identical neighborhoods share one supercell. An HWCR
+shifted by assemblies.shiftAssemb() holds its own copy of the poison slug, which is
+found through the sections it was copied from, and gets its own copy of the supercell.
+"""
+from collections import Counter
+
+import numpy as np
+
+from assemblies import *
+from lattice import neighborTable, positions, flatIndex
+from mesh import axialBounds
+
+
+def sectionAt(assembly, z):
+    """
+    The section of assembly covering the axial coordinate z, None if z is out of assembly
+    """
+    bounds = axialBounds(assembly)
+    idx = int(np.searchsorted(bounds, z, side='right')) - 1
+    return assembly.sections[idx] if 0 <= idx < len(assembly.sections) else None
+
+
+def surroundings(lattice, position, z) -> list:
+    """
+    The sections of neighbors of position (r, k) at axial coordinate z
+    """
+    rk = positions(len(lattice))
+    return [sectionAt(lattice[rk[idx][0]][rk[idx][1]], z) for idx in neighborTable(len(lattice))[flatIndex(*position)] if idx >= 0]
+
+
+def templateIndex(assembly, template):
+    """
+    The index of the section of assembly that is template or copied from it, None if NOT found
+    """
+    originals = getattr(assembly, 'originals', assembly.sections)
+    for idx, (sec, original) in enumerate(zip(assembly.sections, originals)):
+        if sec is template or original is template:
+            return idx
+    return None
+
+
+def buildSupercells(lattice, template=None) -> dict:
+    """
+    Replace the poison slug of every HWCR by the one surrounded by its real neighbors
+
+    Input
+    -----
+    lattice: list, the core lattice
+    template: Section, the poison slug shared by HWCRs, default to hwcrSecs['poisonSlug']
+
+    Return
+    ------
+    The supercells, location of HWCR -> poison section
+    """
+    if template is None:
+        template = hwcrSecs['poisonSlug']
+
+    supercells = dict() # sorted ids of neighbor sections -> poison section
+    result = dict()
+    for r, ring in enumerate(lattice):
+        for k, assembly in enumerate(ring):
+            if not hasattr(assembly, 'nominalRefPlane'):
+                continue
+            idx = templateIndex(assembly, template)
+            if idx is None:
+                continue
+            location = slugmat.convertLocation((r, k))
+
+            # The middle height of poison slug
+            bounds = axialBounds(assembly)
+            z = 0.5 * (bounds[idx] + bounds[idx+1])
+
+            # The most common section around, ignoring the blank margins, sorted so that
+            # a tie is broken alike for the same neighborhood
+            candidates = sorted((sec for sec in surroundings(lattice, (r, k), z) if sec is not None and sec is not blankSec), key=id)
+            if not candidates:
+                raise ValueError("The poison slug of {} has NO neighbor to surround it.".format(location))
+            counts = Counter(id(sec) for sec in candidates)
+            surrounding = next(sec for sec in candidates if counts[id(sec)] == max(counts.values()))
+
+            key = tuple(id(sec) for sec in candidates)
+            if key not in supercells:
+                poison = template.copy(name='{} - {} {:d}'.format(template.name, surrounding.name, len(supercells) + 1))
+                poison.scSection = surrounding
+                supercells[key] = poison
+
+            # The shifted assembly keeps its own sections, which carry its axial coordinates
+            poison = supercells[key]
+            if getattr(assembly, 'detached', False):
+                poison = poison.copy(name=poison.name)
+                poison.scSection = surrounding
+
+            # The sections carry the axial coordinates, so the reference plane is set again
+            sections = list(assembly.sections)
+            sections[idx] = poison
+            assembly.sections = sections
+            refIdx, offset = assembly.nominalRefPlane
+            assembly.setRefPlane(refIdx, offset + getattr(assembly, 'axialShift', 0.))
+            result[location] = poison
+
+    print("{:d} supercells built for the poison slugs of {:d} HWCRs.".format(len(supercells), len(result)))
+
+    return result
@@ -0,0 +1,200 @@
+"""
+Multi-configuration sweep of EBR-II core
+
+The variants of core differ in a few parameters (power, gammaHeat, boundaryConditions,
+meshing tolerance) or in a few swapped assemblies, while the sections & materials,
+which cost most of a build, are identical. So the base lattice is built once, and every
+variant builds its core from copies of its Assembly objects, which Core.complete() &
+the shifts modify, while their Section & Material objects are shared by reference,
+see copyLattice(). A shifted assembly copies its own sections, see shiftAssemb().
+
+The variants are built by a pool of processes, and each variant writes its cards into
+"@OUTPUT_DIR/@NAME/". The forked processes inherit the base lattice without pickling
+it. Where fork is NOT available (like Windows), the processes are spawned and receive
+a pickled base lattice, so the script calling sweep() should be guarded by
+`if __name__ == '__main__':`.
+
+Example
+-------
+```python
+>>> variants = [
+...     {'name': 'power-50MW', 'power': 50E6},
+...     {'name': 'reflect', 'boundaryConditions': (1, 1)},
+...     {'name': 'dummy-05C03', 'swaps': {'05C03': 'dummy'}},
+...     {'name': 'rod-05C03-10cm', 'shifts': {'05C03': 10.0}}
+... ]
+>>> sweep(variants, outputDir='output/sweep', maxWorkers=4)
+```
+"""
+import os
+import copy
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from core import *
+from output import writeTULIP, writeLAVENDER
+
+PARAMS = ('power', 'gammaHeat', 'boundaryConditions', 'tolerance')
+VARIANT_KEYS = ('name', 'swaps', 'shifts', 'plot') + PARAMS
+
+# The base lattice & variants of the running sweep, inherited by the forked workers
+# or received by the spawned ones, see initWorker()
+_base = None
+_variants = None
+_swapped = dict() # (location, assemblyType, MKType) -> Assembly, shared by the variants
+
+
+def checkVariant(variant):
+    """
+    Check the keys of variant, like {'name': 'power-50MW', 'power': 50E6, 'swaps': {'05C03': 'dummy'}}
+
+    The shifts of variant move the assemblies axially, like {'shifts': {'05C03': -10.0}}, see shiftLattice()
+    """
+    assert type(variant) is dict
+    if 'name' not in variant:
+        raise ValueError("Variant {} has NO name.".format(variant))
+    for key in variant:
+        if key not in VARIANT_KEYS:
+            raise ValueError("Unknown key '{}' of variant [{}], which should be in {}".format(key, variant['name'], VARIANT_KEYS))
+
+
+def swapLattice(lattice, swaps) -> list:
+    """
+    Copy the lattice with some assemblies swapped
+
+    Input
+    -----
+    lattice: list, the base lattice
+    swaps: dict, location -> assembly type, (assembly type, MKType) or Assembly,
+           like {'05C03': 'dummy', '02A01': ('driver', 'MKIIA')}
+
+    Only the rings are copied, so the unchanged assemblies are shared with the base lattice.
+    """
+    lattice = [list(ring) for ring in lattice]
+    for location, swap in swaps.items():
+        r, k = slugmat.convertLocation(location)
+        if type(swap) is str:
+            swap = (swap, 'MKII')
+        if type(swap) is tuple:
+            if (location, *swap) not in _swapped:
+                _swapped[(location, *swap)] = buildAssemb(swap[0], location, swap[1])
+            swap = _swapped[(location, *swap)]
+        lattice[r][k] = swap
+
+    return lattice
+
+
+def copyLattice(lattice) -> list:
+    """
+    Copy the Assembly objects of lattice, sharing their sections (& the materials in them)
+
+    The assemblies shared by positions, like blank, are still shared by the copies.
+    """
+    memo = dict() # Sections are copied to themselves by deepcopy()
+    for ring in lattice:
+        for assembly in ring:
+            for sec in assembly.sections:
+                memo[id(sec)] = sec
+                if getattr(sec, 'scSection', None) is not None:
+                    memo[id(sec.scSection)] = sec.scSection
+
+    return [[copy.deepcopy(assembly, memo) for assembly in ring] for ring in lattice]
+
+
+def buildVariant(idx, outputDir) -> str:
+    """
+    Build the idx-th variant of the running sweep, and write its cards
+
+    Return
+    ------
+    The output directory of variant
+    """
+    variant = _variants[idx]
+    # A process builds several variants, so each one modifies its own copy of assemblies
+    lattice = copyLattice(swapLattice(_base, variant.get('swaps', {})))
+    shiftLattice(lattice, variant.get('shifts', {}))
+    core = buildCore(lattice, **{key: variant[key] for key in PARAMS if key in variant})
+
+    path = os.path.join(outputDir, variant['name'])
+    os.makedirs(path, exist_ok=True)
+    writeTULIP(core, os.path.join(path, 'TPmate.inp'))
+    writeLAVENDER(core, os.path.join(path, 'lavender.inp'))
+    if variant.get('plot', False):
+        core.plotRaial(savePath=os.path.join(path, 'radial.svg'))
+        core.plotAxial(savePath=os.path.join(path, 'axial.svg'))
+
+    return path
+
+
+def initWorker(base, variants, swapped):
+    """
+    Receive the running sweep in a spawned process
+    """
+    global _base, _variants, _swapped
+    _base, _variants, _swapped = base, variants, swapped
+
+
+def sweep(variants, lattice=None, outputDir=None, maxWorkers=None) -> dict:
+    """
+    Build the variants of core sharing one base lattice
+
+    Input
+    -----
+    variants: list, the dicts of variant, see checkVariant()
+    lattice: list, the base lattice, built by buildLattice() if None
+    outputDir: str, the output directory, default to "./output/sweep"
+    maxWorkers: int, the number of processes, default to the number of CPUs, 1 to build in this process
+
+    Return
+    ------
+    A dict of variant name -> output directory, or the error raised by the variant
+    """
+    global _base, _variants
+
+    for variant in variants:
+        checkVariant(variant)
+    names = [variant['name'] for variant in variants]
+    if len(set(names)) != len(names):
+        raise ValueError("The names of variants should be unique.")
+
+    if outputDir is None:
+        outputDir = os.path.join(os.getcwd(), 'output', 'sweep')
+    os.makedirs(outputDir, exist_ok=True)
+
+    _base = buildLattice() if lattice is None else lattice
+    _variants = variants
+
+    # Build the swapped assemblies before starting the workers, so that they are shared by them
+    for variant in variants:
+        swapLattice(_base, variant.get('swaps', {}))
+
+    results = dict()
+    if maxWorkers == 1:
+        for idx, name in enumerate(names):
+            try:
+                results[name] = buildVariant(idx, outputDir)
+            except Exception as err:
+                results[name] = err
+            print("Variant [{}] finished.".format(name))
+    else:
+        if 'fork' in multiprocessing.get_all_start_methods():
+            context, initializer, initargs = multiprocessing.get_context('fork'), None, ()
+        else:
+            context, initializer, initargs = multiprocessing.get_context('spawn'), initWorker, (_base, _variants, _swapped)
+        with ProcessPoolExecutor(max_workers=maxWorkers, mp_context=context,
+                                 initializer=initializer, initargs=initargs) as executor:
+            futures = {executor.submit(buildVariant, idx, outputDir): name for idx, name in enumerate(names)}
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    results[name] = future.result()
+                except Exception as err:
+                    results[name] = err
+                print("Variant [{}] finished.".format(name))
+
+    failed = [name for name in names if isinstance(results[name], Exception)]
+    print("{:d} of {:d} variants built in {}.".format(len(names) - len(failed), len(names), outputDir))
+    for name in failed:
+        print("Variant [{}] failed: {}".format(name, results[name]))
+
+    return results
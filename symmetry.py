@@ -0,0 +1,157 @@
+"""
+Symmetry check & symmetrized lattice
+
+The assembly type map from assembLocations.xlsx, and optionally the slug compositions
+from the CSV material files, are compared under the rotations & reflections of hexagon
+(see lattice.TRANSFORMS), and the deviations are reported.
+
+For scoping runs, symmetrize() builds a lattice where every position refers to the
+assembly of its representative in the 1/6 (or 1/3, 1/2) sector. It is still a full-core
+lattice: NO reduced domain or boundary conditions are built here, as buildCore() only
+models the full core. The TULIP geometry blocks of a sector are then identical to those
+of the others, so divider.divide(..., dedup=True) solves about 1/6 of the geometries.
+reducedPositions() only lists the positions of the sector.
+"""
+import numpy as np
+
+from assemblies import *
+from lattice import RING_NUM, positions, orbitPairs, flatten, nest, TRANSFORMS
+
+
+def typeMap(ringNum=RING_NUM) -> np.ndarray:
+    """
+    The type of assembly at every position in the order of flat index, like 'driver-MKII'
+    """
+    labels = []
+    for r, k in positions(ringNum):
+        location, assemblyType, MKType = locateAssemb((int(r), int(k)))
+        labels.append('-'.join((assemblyType, MKType)))
+    return np.array(labels)
+
+
+def compositions(ringNum=RING_NUM) -> list:
+    """
+    The densities of slugs at every position in the order of flat index,
+    as DataFrame(ZAIDS, S1, S2, ...) or None without CSV material file
+    """
+    result = []
+    for r, k in positions(ringNum):
+        try:
+            result.append(pd.read_csv(slugmat.find((int(r), int(k)))).set_index('ZAIDS'))
+        except FileNotFoundError:
+            result.append(None)
+    return result
+
+
+def compositionDeviation(compA, compB) -> float:
+    """
+    The largest relative deviation between the slug densities of two positions
+    """
+    if compA is None or compB is None:
+        return 0. if compA is None and compB is None else np.inf
+    compA, compB = compA.align(compB, fill_value=0.)
+    a, b = compA.to_numpy(dtype=float), compB.to_numpy(dtype=float)
+    scale = np.maximum(np.abs(a), np.abs(b))
+    return float(np.max(np.abs(a - b) / np.where(scale > 0, scale, 1.), initial=0.))
+
+
+def checkSymmetry(labels, name, comps=None, tolerance=1E-3, ringNum=RING_NUM) -> list:
+    """
+    Check the type map (and slug compositions) under a symmetry
+
+    Input
+    -----
+    labels: np.ndarray, the type map from typeMap()
+    name: str, the symmetry in lattice.TRANSFORMS, like 'rot60' or 'mirror0'
+    comps: list, the slug compositions from compositions(), NOT checked if None
+    tolerance: float, the largest relative deviation of slug compositions
+
+    Return
+    ------
+    The deviations, like [('01A01', '02C01', 'driver-MKII', 'HWD-MKII', None), ...]
+    where the last item is the composition deviation if the types are identical
+    """
+    rk = positions(ringNum)
+    convert = lambda idx: slugmat.convertLocation((int(rk[idx][0]), int(rk[idx][1])))
+
+    # Every orbit of the permutation once, with the wrap-around pair of a rotation
+    pairs = orbitPairs(name, ringNum)
+    deviations = []
+    for idx, image in pairs[labels[pairs[:, 0]] != labels[pairs[:, 1]]]:
+        deviations.append((convert(idx), convert(image), labels[idx], labels[image], None))
+
+    if comps is not None:
+        for idx, image in pairs[labels[pairs[:, 0]] == labels[pairs[:, 1]]]:
+            deviation = compositionDeviation(comps[idx], comps[image])
+            if deviation > tolerance:
+                deviations.append((convert(idx), convert(image), labels[idx], labels[image], deviation))
+
+    return deviations
+
+
+def report(checkComposition=False, tolerance=1E-3, ringNum=RING_NUM) -> dict:
+    """
+    Check the core lattice under all symmetries of hexagon, and print the deviations
+
+    Return
+    ------
+    A dict of symmetry name -> deviations, see checkSymmetry()
+    """
+    labels = typeMap(ringNum)
+    comps = compositions(ringNum) if checkComposition else None
+
+    result = dict()
+    for name in TRANSFORMS:
+        result[name] = checkSymmetry(labels, name, comps, tolerance, ringNum)
+        print("{:<8} {:d} deviations".format(name, len(result[name])))
+        for locA, locB, typeA, typeB, deviation in result[name]:
+            if deviation is None:
+                print("    {} {:<14} <-> {} {}".format(locA, typeA, locB, typeB))
+            else:
+                print("    {} <-> {} {}: composition deviates by {:.3e}".format(locA, locB, typeA, deviation))
+
+    return result
+
+
+def representatives(order=6, ringNum=RING_NUM) -> np.ndarray:
+    """
+    The flat index of the representative of every position under the rotational symmetry of order 6, 3 or 2
+
+    The representatives are in the first 6/order sectors, like the 1/6 core from k = 0 to r-1.
+    """
+    if order not in (2, 3, 6):
+        raise ValueError("The order of rotational symmetry should be 2, 3 or 6, NOT {}".format(order))
+
+    rk = positions(ringNum)
+    r, k = rk[:, 0], rk[:, 1]
+    repK = np.where(r > 0, k % np.maximum(6 // order * r, 1), 0)
+    return np.where(r > 0, 1 + 3 * r * (r - 1) + repK, 0)
+
+
+def reducedPositions(order=6, ringNum=RING_NUM) -> list:
+    """
+    The (r, k) of positions in the reduced core, like the 1/6 core for order 6
+    """
+    reps = representatives(order, ringNum)
+    return [tuple(int(i) for i in rk) for rk in positions(ringNum)[np.unique(reps)]]
+
+
+def symmetrize(lattice, order=6) -> list:
+    """
+    Build the full-core lattice where every position refers to the assembly of its representative
+
+    The lattice is symmetrized, NOT reduced: every position is still modelled, with the
+    boundary conditions of the full core.
+
+    Input
+    -----
+    lattice: list, the core lattice
+    order: int, the order of rotational symmetry, 6 for 1/6 core, 3 for 1/3 core, 2 for 1/2 core
+    """
+    items = flatten(lattice)
+    reps = representatives(order, len(lattice))
+    return nest([items[rep] for rep in reps], len(lattice))
+
+
+if __name__ == '__main__':
+    report(checkComposition=False)
@@ -0,0 +1,15 @@
+"""
+Common setup of tests
+
+The modules are imported from the root of repository. WORK_PATH & PYSARAX_PATH
+are keyed by the user names of authors, so the tests run as one of them.
+"""
+import os
+import sys
+import getpass
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+getpass.getuser = lambda: 'admin'
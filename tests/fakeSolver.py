@@ -0,0 +1,36 @@
+"""
+Stand-in of LoongSARAX for the tests of runner.py
+
+Usage: python fakeSolver.py <cardId> [mode]
+    mode 'ok':    write "TPmate.out" with a block of every material in TPmate.inp
+    mode 'flaky': fail at the first attempt, then behave like 'ok'
+    mode 'fail':  always fail
+    mode 'sleep': sleep for 10 s
+"""
+import os
+import re
+import sys
+import time
+
+
+def solve():
+    with open('TPmate.inp', 'r', encoding='utf-8') as f:
+        matNum = len(re.findall(r'^mat\d+', f.read(), flags=re.M))
+    with open('TPmate.out', 'w', encoding='utf-8') as f:
+        for matId in range(1, matNum + 1):
+            f.write('mat{:d}\n  k = {:d}\n'.format(matId, matId))
+
+
+if __name__ == '__main__':
+    cardId = sys.argv[1]
+    mode = sys.argv[2] if len(sys.argv) > 2 else 'ok'
+    print('Solving batch {} in mode {}'.format(cardId, mode))
+
+    if mode == 'fail':
+        sys.exit(3)
+    if mode == 'sleep':
+        time.sleep(10)
+    if mode == 'flaky' and not os.path.exists('attempted'):
+        open('attempted', 'w').close()
+        sys.exit(1)
+    solve()
@@ -0,0 +1,71 @@
+"""
+Tests of card.py
+"""
+import os
+
+from card import TulipCard
+
+CARD = """! EBR-II TULIP card
+
+CONTROL:
+n_mat                 3
+geom_kind             3*1
+! comment kept as it is
+
+GEOMETRY:
+mat1
+ring_num              2
+compose               fuel1 sodium
+
+
+mat2
+ring_num              2
+compose               fuel2 sodium
+
+
+mat3
+ring_num              2
+compose               fuel1 sodium
+
+
+
+MATERIAL:
+fuel1
+92235 1e-3
+
+fuel2
+92238 2e-2
+
+sodium
+11023 2e-2
+"""
+
+
+def testRoundTrip(tmp_path):
+    card = TulipCard.parse(CARD)
+    assert str(card) == CARD
+    assert card.control['n_mat'] == '3'
+    assert [block.matId for block in card.geometry] == [1, 2, 3]
+    assert sorted(card.materials) == ['fuel1', 'fuel2', 'sodium']
+
+    path = os.path.join(str(tmp_path), 'TPmate.inp')
+    card.write(path)
+    assert str(TulipCard.read(path)) == CARD
+
+
+def testCanonicalBlocks():
+    card = TulipCard.parse(CARD)
+    first, second, third = card.geometry
+    # The first block carries the newline after 'GEOMETRY:'
+    assert first.text != third.renumber(1)
+    assert first.digest == third.digest
+    assert first.digest != second.digest
+    assert card.referredMaterials(first) == ['fuel1', 'sodium']
+
+
+def testDiff():
+    card = TulipCard.parse(CARD)
+    other = TulipCard.parse(CARD.replace('92238 2e-2', '92238 3e-2'))
+    other.control['n_mat'] = 4
+    assert card.diff(other) == {'control': ['n_mat'], 'geometry': [], 'materials': ['fuel2']}
+    assert str(other).count('n_mat                 4') == 1
@@ -0,0 +1,170 @@
+"""
+Tests of divider.py on a small TULIP card
+"""
+import os
+
+import pytest
+
+from divider import divide, materialize, FileWriter, BlockStore, CARD_NAME
+
+CARD = """! EBR-II TULIP card
+
+CONTROL:
+n_mat                 7
+geom_kind             4*1 3*2
+mode                  1
+
+GEOMETRY:
+""" + '\n\n\n'.join("""mat{:d}
+ring_num              2
+region                0.5 1.0
+compose               fuel{:d} sodium""".format(matId, matId % 3) for matId in range(1, 8)) + """
+
+
+
+MATERIAL:
+fuel0
+92235 1e-3
+
+fuel1
+92238 2e-2
+
+fuel2
+94239 2e-3
+
+sodium
+11023 2e-2
+"""
+
+
+@pytest.fixture
+def cardPath(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    path = os.path.join(str(tmp_path), 'TPmate.inp')
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        f.write(CARD)
+    return path
+
+
+def readCards(jobName, batches):
+    cards = []
+    for info in batches:
+        with open(materialize(jobName, info['matDir']), 'r', encoding='utf-8', newline='') as f:
+            cards.append(f.read())
+    return cards
+
+
+@pytest.mark.parametrize('workers', [0, 4])
+def testCompactCardsMatchPlainCards(cardPath, workers):
+    plain = divide('plain', cardPath, batchSize=3, workers=workers)
+    compact = divide('compact', cardPath, batchSize=3, compact=True, workers=workers)
+
+    assert [info['hash'] for info in plain] == [info['hash'] for info in compact]
+    assert readCards('plain', plain) == readCards('compact', compact)
+    assert all(not os.path.exists(os.path.join('compact', info['matDir'], CARD_NAME + '.tmp')) for info in compact)
+
+
+def testCompactSharesHeaderAndMaterials(cardPath):
+    batches = divide('compact', cardPath, batchSize=3, compact=True, workers=0)
+    blocks = os.listdir(os.path.join('compact', 'blocks'))
+    # One header & one material card shared by the batches, whose CONTROL (by geom_kind) & geometry differ
+    assert len(blocks) == 2 + 2 * len(batches)
+
+
+def testBlockWrittenOnceWhilePending(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.mkdir('job')
+    writes = []
+    with FileWriter(workers=4) as writer:
+        write = writer.write
+        writer.write = lambda path, *args, **kwargs: writes.append(path) or write(path, *args, **kwargs)
+        store = BlockStore('job', writer)
+        shas = {store.put('mat1\nring_num 2\n') for _ in range(20)}
+    assert len(shas) == 1
+    assert len(writes) == 1
+
+
+def testWriterClosedOnError(cardPath, monkeypatch):
+    import divider
+    writers = []
+    original = divider.FileWriter
+
+    class RecordingWriter(original):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            writers.append(self)
+
+    def broken(*args, **kwargs):
+        raise RuntimeError('broken batch')
+
+    monkeypatch.setattr(divider, 'FileWriter', RecordingWriter)
+    monkeypatch.setattr(divider, 'generateCard', broken)
+    with pytest.raises(RuntimeError, match='broken batch'):
+        divider.divide('job', cardPath, batchSize=3, workers=4)
+    assert writers and all(writer.executor is None for writer in writers)
+
+
+def testStreamCardsMatchPlainCards(cardPath):
+    from divider import divideStream
+    from output import iterCard
+
+    plain = divide('plain', cardPath, batchSize=3, workers=0)
+    stream = divideStream('stream', iterCard(CARD), batchSize=3, workers=4)
+    assert [info['hash'] for info in plain] == [info['hash'] for info in stream]
+    assert readCards('plain', plain) == readCards('stream', stream)
+
+
+def testDedupFirstBlock(cardPath):
+    from divider import readFanout
+
+    # MAT1 follows 'GEOMETRY:\n' with a leading newline, but is identical to MAT4 of the same geom_kind
+    batches = divide('dedup', cardPath, batchSize=3, dedup=True, workers=0)
+    assert readFanout('dedup') == {1: [1, 4], 2: [2], 3: [3], 4: [5], 5: [6], 6: [7]}
+    assert batches[-1]['endId'] == 6
+
+
+def testIncrementalRewritesChangedBatches(cardPath):
+    first = divide('job', cardPath, batchSize=3, incremental=True, workers=0)
+    assert all(info['state'] == 'dirty' for info in first)
+    for info in first:
+        os.utime(os.path.join('job', info['matDir'], CARD_NAME), (0, 0))
+
+    # fuel0 is referred to by MAT3 & MAT6 only, NOT by MAT7 of the last batch
+    with open(cardPath, 'w', encoding='utf-8', newline='') as f:
+        f.write(CARD.replace('92235 1e-3', '92235 2e-3'))
+    second = divide('job', cardPath, batchSize=3, incremental=True, workers=0)
+
+    assert [info['state'] for info in second] == ['dirty', 'dirty', 'clean']
+    assert [info['hash'] for info in second][2] == first[2]['hash']
+    mtimes = [os.stat(os.path.join('job', info['matDir'], CARD_NAME)).st_mtime for info in second]
+    assert mtimes[0] > 0 and mtimes[1] > 0 and mtimes[2] == 0
+
+
+def testUnusedBlocksCollected(cardPath):
+    divide('compact', cardPath, batchSize=3, compact=True, incremental=True, workers=0)
+    before = set(os.listdir(os.path.join('compact', 'blocks')))
+
+    with open(cardPath, 'w', encoding='utf-8', newline='') as f:
+        f.write(CARD.replace('92238 2e-2', '92238 3e-2'))
+    batches = divide('compact', cardPath, batchSize=3, compact=True, incremental=True, workers=0)
+    after = set(os.listdir(os.path.join('compact', 'blocks')))
+
+    # fuel1 is referred to by every batch, so the old material card is referred to by NO recipe
+    assert len(after) == len(before)
+    assert before - after and after - before
+    assert readCards('compact', batches)[0].endswith(CARD.split('MATERIAL:')[1].replace('92238 2e-2', '92238 3e-2'))
+
+
+def testStreamCardsSynced(cardPath, monkeypatch):
+    from divider import divideStream
+    from output import iterCard
+
+    synced = []
+    fsync = os.fsync
+    monkeypatch.setattr(os, 'fsync', lambda fd: synced.append(os.fstat(fd).st_size) or fsync(fd))
+    batches = divideStream('stream', iterCard(CARD), batchSize=3, workers=4)
+
+    # Every card is flushed with its materials appended, then its directory
+    sizes = sorted(os.path.getsize(os.path.join('stream', info['matDir'], CARD_NAME)) for info in batches)
+    assert sorted(synced[:len(batches)]) == sizes
+    assert len(synced) == 2 * len(batches)
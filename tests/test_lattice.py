@@ -0,0 +1,68 @@
+"""
+Tests of lattice.py
+"""
+import numpy as np
+
+from lattice import (RING_NUM, TRANSFORMS, positionNum, positions, locations, flatIndex,
+                     permutation, orbitPairs, neighborTable, neighbors, flatten, nest)
+
+
+def testFlatIndex():
+    rk = positions()
+    assert len(rk) == positionNum() == 1 + 3 * RING_NUM * (RING_NUM - 1)
+    assert all(flatIndex(r, k) == idx for idx, (r, k) in enumerate(rk))
+    assert locations()[0] == '01A01'
+    assert len(set(locations())) == positionNum()
+
+    items = list(range(positionNum()))
+    assert flatten(nest(items)) == items
+
+
+def testPermutations():
+    identity = np.arange(positionNum())
+    for name in TRANSFORMS:
+        perm = permutation(name)
+        assert sorted(perm) == list(identity), name # A bijection of positions
+        if name.startswith('mirror') or name == 'rot180':
+            assert (perm[perm] == identity).all(), name
+
+    # Rotation by 60 degrees maps position k to k + r in ring r
+    rk = positions()
+    perm = permutation('rot60')
+    for idx, (r, k) in enumerate(rk):
+        if r > 0:
+            assert perm[idx] == flatIndex(r, (k + r) % (6 * r))
+
+    power = identity
+    for _ in range(6):
+        power = perm[power]
+    assert (power == identity).all()
+    assert (perm[perm[identity]] == permutation('rot120')).all()
+
+
+def testOrbitPairs():
+    # Every position of a rotation is compared to its image, including the wrap-around
+    pairs = orbitPairs('rot60')
+    perm = permutation('rot60')
+    assert len(pairs) == positionNum() - 1
+    assert (perm[pairs[:, 0]] == pairs[:, 1]).all()
+    assert (flatIndex(1, 5), flatIndex(1, 0)) in set(map(tuple, pairs.tolist()))
+
+    # Every pair of a reflection once
+    pairs = orbitPairs('mirror0')
+    fixed = (permutation('mirror0') == np.arange(positionNum())).sum()
+    assert len(pairs) == (positionNum() - fixed) // 2
+    assert len({frozenset(pair) for pair in pairs.tolist()}) == len(pairs)
+
+
+def testNeighbors():
+    table = neighborTable()
+    assert sorted(table[0]) == list(range(1, 7))
+    for idx, row in enumerate(table):
+        for neighbor in row[row >= 0]:
+            assert idx in table[neighbor] # Symmetric
+    # The positions of the outest ring have neighbors outside the lattice
+    outer = flatIndex(RING_NUM - 1, 0)
+    assert (table[outer] < 0).sum() == 3
+    assert (table[flatIndex(RING_NUM - 1, 1)] < 0).sum() == 2
+    assert sorted(neighbors(0, 0)) == [(1, k) for k in range(6)]
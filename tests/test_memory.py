@@ -0,0 +1,40 @@
+"""
+Tests of memory.py
+"""
+import pytest
+
+import memory
+from memory import MemoryTracker
+
+
+def testPhasePeak():
+    tracker = MemoryTracker(cap=1E6, trace=False)
+    with tracker.phase('alloc'):
+        block = bytearray(32 * memory.MB)
+    del block
+    tracker.stop()
+
+    if memory.currentRSS() is not None:
+        assert tracker.peak >= 32
+
+
+def testUnavailableRSS(monkeypatch, capsys):
+    monkeypatch.setattr(memory, 'currentRSS', lambda: None)
+    tracker = MemoryTracker(cap=1., trace=False, strict=True)
+    with tracker.phase('lattice'): # NOT raised without RSS
+        pass
+    tracker.report()
+    tracker.stop()
+
+    assert tracker.peak is None
+    out = capsys.readouterr().out
+    assert 'unavailable' in out
+    assert 'within' not in out
+
+
+def testStrictCap(monkeypatch):
+    monkeypatch.setattr(memory, 'currentRSS', lambda: 2 * memory.MB)
+    tracker = MemoryTracker(cap=1., trace=False, strict=True)
+    with pytest.raises(MemoryError):
+        with tracker.phase('core'):
+            pass
@@ -0,0 +1,84 @@
+"""
+Tests of merge.py
+"""
+import os
+
+import pytest
+
+from divider import generateManifest, generateFanout
+from merge import merge
+
+JOB_NAME = 'job'
+
+
+def writeBatch(jobDir, info, matNum):
+    os.makedirs(os.path.join(jobDir, info['matDir']))
+    with open(os.path.join(jobDir, info['matDir'], 'TPmate.out'), 'w', encoding='utf-8') as f:
+        for localId in range(1, matNum + 1):
+            f.write('mat{:d}\n  k = {:d}\n'.format(localId, info['startId'] + localId - 1))
+
+
+@pytest.fixture
+def dedupJob(tmp_path, monkeypatch):
+    """
+    3 unique geometries of 6 materials, where MAT1,4 -> 1, MAT2,5 -> 2 & MAT3,6 -> 3
+    """
+    monkeypatch.chdir(tmp_path)
+    jobDir = os.path.join(str(tmp_path), JOB_NAME)
+    batches = [
+        {'cardId': 0, 'matDir': 'mat1-2', 'startId': 1, 'endId': 2, 'hash': 'h', 'state': 'dirty'},
+        {'cardId': 1, 'matDir': 'mat3-3', 'startId': 3, 'endId': 3, 'hash': 'h', 'state': 'dirty'}
+    ]
+    for info in batches:
+        writeBatch(jobDir, info, info['endId'] - info['startId'] + 1)
+    generateManifest(batches, JOB_NAME)
+    generateFanout({1: [1, 4], 2: [2, 5], 3: [3, 6]}, JOB_NAME)
+    return jobDir
+
+
+def testDedupMergeKeepsMaterialOrder(dedupJob):
+    outputPath = os.path.join(dedupJob, 'merged.out')
+    report = merge(JOB_NAME, outputPath)
+    assert report['materials'] == 6
+
+    with open(outputPath, 'r', encoding='utf-8') as f:
+        tags = [line.strip() for line in f if line.startswith('mat')]
+    assert tags == ['mat{:d}'.format(matId) for matId in range(1, 7)]
+    assert not os.path.exists(outputPath + '.blocks.tmp')
+
+
+@pytest.fixture
+def plainJob(tmp_path, monkeypatch):
+    """
+    2 batches of 3 materials, MAT1-2 & MAT3-3
+    """
+    monkeypatch.chdir(tmp_path)
+    jobDir = os.path.join(str(tmp_path), JOB_NAME)
+    batches = [
+        {'cardId': 0, 'matDir': 'mat1-2', 'startId': 1, 'endId': 2, 'hash': 'h', 'state': 'dirty'},
+        {'cardId': 1, 'matDir': 'mat3-3', 'startId': 3, 'endId': 3, 'hash': 'h', 'state': 'dirty'}
+    ]
+    for info in batches:
+        writeBatch(jobDir, info, info['endId'] - info['startId'] + 1)
+    return jobDir, batches
+
+
+def testMissingBatch(plainJob):
+    jobDir, batches = plainJob
+    generateManifest(batches, JOB_NAME)
+    os.remove(os.path.join(jobDir, 'mat3-3', 'TPmate.out'))
+
+    outputPath = os.path.join(jobDir, 'merged.out')
+    with pytest.raises(RuntimeError, match=r'Result of batch \[mat3-3\] is missing'):
+        merge(JOB_NAME, outputPath)
+    assert not os.path.exists(outputPath)
+
+
+def testDuplicatedBatch(plainJob):
+    jobDir, batches = plainJob
+    generateManifest(batches + [dict(batches[1], cardId=2)], JOB_NAME)
+
+    outputPath = os.path.join(jobDir, 'merged.out')
+    with pytest.raises(RuntimeError, match=r'Batch \[mat3-3\] is duplicated in manifest'):
+        merge(JOB_NAME, outputPath)
+    assert not os.path.exists(outputPath)
@@ -0,0 +1,47 @@
+"""
+Tests of mesh.py
+"""
+import numpy as np
+
+from mesh import AxialMesh, mergeBounds, nextTolerance
+
+
+class FixedAssembly:
+
+    def __init__(self, bounds) -> None:
+        self.fixedBounds = bounds
+
+
+def testChainNotMergedAsWhole():
+    bounds = np.arange(21) / 8. # A chain of gaps smaller than tolerance
+    planes, labels = mergeBounds(bounds, 0.25)
+    assert len(planes) == 7
+    assert np.abs(planes[labels] - bounds).max() <= 0.125
+
+
+def testAdapt():
+    mesh = AxialMesh([[FixedAssembly((0., 0.05, 0.1, 0.15, 0.2, 1.0, 1.05, 3.0))]])
+    assert mesh.count == 3
+
+    result = mesh.adapt(maxCount=2)
+    assert result['estimatedCount'] <= 2
+    mesh.remesh(result['tolerance'] * 0.99)
+    assert mesh.count > 2 # The smallest tolerance
+
+    result = mesh.adapt(maxShift=0.03)
+    assert result['estimatedWorstShift'] <= 0.03
+    assert 0.06 <= result['tolerance'] < 0.1 # The largest tolerance, before 0 & 0.1 are merged
+
+
+def testNextTolerance():
+    bounds = np.array((0., 0.05, 0.1, 0.15, 0.2, 1.0, 1.05, 3.0))
+    assert np.isclose(nextTolerance(bounds, 0.1), 0.15) # 0.15 joins 0, NOT 1.0 joins 0.15
+    assert np.isclose(nextTolerance(bounds, 1.5), 3.0)
+    assert nextTolerance(bounds, 3.0) == np.inf
+
+    # Every step changes the merging, until all boundaries are merged
+    tolerance, labels = 0., []
+    while tolerance < np.inf:
+        labels.append(tuple(mergeBounds(bounds, tolerance)[1]))
+        tolerance = nextTolerance(bounds, tolerance)
+    assert len(set(labels)) == len(labels) and labels[-1] == (0,) * len(bounds)
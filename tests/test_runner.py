@@ -0,0 +1,89 @@
+"""
+Tests of runner.py with fakeSolver.py standing in for LoongSARAX
+"""
+import os
+import sys
+
+import pytest
+
+import runner
+from divider import generateManifest
+
+FAKE_SOLVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fakeSolver.py')
+JOB_NAME = 'job'
+
+
+def command(mode='ok'):
+    return (sys.executable, FAKE_SOLVER, '{cardId}', mode)
+
+
+@pytest.fixture
+def job(tmp_path, monkeypatch):
+    """
+    A divided job of 3 batches with 2 materials each
+    """
+    monkeypatch.chdir(tmp_path)
+    batches = []
+    for cardId in range(3):
+        info = {'cardId': cardId, 'startId': 2 * cardId + 1, 'endId': 2 * cardId + 2, 'hash': 'h{:d}'.format(cardId), 'state': 'dirty'}
+        info['matDir'] = 'mat{:d}-{:d}'.format(info['startId'], info['endId'])
+        os.makedirs(tmp_path / JOB_NAME / info['matDir'])
+        with open(tmp_path / JOB_NAME / info['matDir'] / 'TPmate.inp', 'w', encoding='utf-8') as f:
+            f.write('CONTROL:\nGEOMETRY:\nmat1\n\n\nmat2\n')
+        batches.append(info)
+    generateManifest(batches, JOB_NAME)
+    return tmp_path / JOB_NAME
+
+
+def testRunAll(job):
+    report = runner.run(JOB_NAME, command=command(), maxWorkers=2)
+    assert report['batches'] == 3
+    assert report['materials'] == 6
+    assert report['failed'] == 0
+    assert all(s['status'] == 'done' for s in runner.readStatus(JOB_NAME).values())
+    assert (job / 'mat3-4' / 'TPmate.out').read_text(encoding='utf-8').startswith('mat1')
+
+
+def testResumeSkipsDone(job):
+    runner.run(JOB_NAME, command=command(), maxWorkers=2)
+    report = runner.run(JOB_NAME, command=command('fail'), maxWorkers=2)
+    assert report['skipped'] == 3
+    assert report['batches'] == 0
+
+
+def testRerunChangedCard(job):
+    runner.run(JOB_NAME, command=command(), maxWorkers=2)
+    batches = runner.readManifest(JOB_NAME)
+    batches[1]['hash'] = 'changed'
+    generateManifest(batches, JOB_NAME)
+
+    report = runner.run(JOB_NAME, command=command(), maxWorkers=2)
+    assert report['batches'] == 1
+    assert report['skipped'] == 2
+
+
+def testRetryFlaky(job):
+    report = runner.run(JOB_NAME, command=command('flaky'), maxWorkers=3, retries=1)
+    assert report['batches'] == 3
+    assert all(s['attempts'] == 2 for s in runner.readStatus(JOB_NAME).values())
+
+
+def testFailedAfterRetries(job):
+    report = runner.run(JOB_NAME, command=command('fail'), maxWorkers=3, retries=2)
+    assert report['failed'] == 3
+    status = runner.readStatus(JOB_NAME)
+    assert all(s['status'] == 'failed' and s['attempts'] == 3 for s in status.values())
+
+
+def testMissingSolver(job):
+    report = runner.run(JOB_NAME, command=('definitely-not-a-solver-xyz', '{cardId}'), maxWorkers=2, retries=1)
+    assert report['failed'] == 3
+    status = runner.readStatus(JOB_NAME)
+    assert all(s['status'] == 'failed' and s['attempts'] == 2 for s in status.values())
+    assert 'Failed to run' in (job / 'mat1-2' / runner.LOG_NAME).read_text(encoding='utf-8')
+
+
+def testTimeout(job):
+    returncode, elapsed = runner.runBatch(runner.readManifest(JOB_NAME)[0], JOB_NAME, command('sleep'), timeout=0.5)
+    assert returncode == runner.TIMEOUT_CODE
+    assert elapsed < 10
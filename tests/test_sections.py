@@ -0,0 +1,21 @@
+"""
+Tests of sections.py, which need pySARAX to import the sections
+"""
+import numpy as np
+import pytest
+
+try:
+    from sections import pinRingShares, pinDiameters, cellPitch, steelNumbers, ring
+except Exception as err: # pySARAX or the data of model NOT available
+    pytest.skip("The core model is NOT importable: {}".format(err), allow_module_level=True)
+
+
+def testPinRingShares():
+    shares = pinRingShares(ring, cellPitch, pinDiameters, steelNumbers)
+    assert len(shares) == ring
+    for eqPitch, *fractions in shares:
+        assert np.isclose(sum(fractions), 1.) and all(fraction >= 0. for fraction in fractions)
+    assert [eqPitch for eqPitch, *fractions in shares] == sorted(eqPitch for eqPitch, *fractions in shares)
+
+    # The same signature is computed once
+    assert pinRingShares(ring, cellPitch, tuple(pinDiameters), tuple(steelNumbers)) is shares
@@ -0,0 +1,61 @@
+"""
+Tests of supercell.py on a lattice of 2 rings, which need pySARAX to import the sections
+"""
+import pytest
+
+try:
+    from supercell import buildSupercells
+    from assemblies import shiftAssemb, slugmat
+except Exception as err: # pySARAX or the data of model NOT available
+    pytest.skip("The core model is NOT importable: {}".format(err), allow_module_level=True)
+
+
+class FakeSection:
+
+    def __init__(self, name, height) -> None:
+        self.name = name
+        self.height = height
+        self.scSection = None
+
+    def copy(self, name):
+        return FakeSection(name, self.height)
+
+
+class FakeAssembly:
+
+    def __init__(self, sections) -> None:
+        self.sections = sections
+        self.nominalRefPlane = (0, 0.)
+
+    def setRefPlane(self, idx, offset):
+        self.refPlane = (idx, offset)
+
+
+@pytest.fixture
+def hwcrLattice():
+    template = FakeSection('poison slug', 10.)
+    driver = FakeSection('driver', 40.)
+    hwcr = FakeAssembly([FakeSection('lower', 10.), template])
+    return [[hwcr], [FakeAssembly([driver]) for _ in range(6)]], template, driver
+
+
+def testSupercellByLocation(hwcrLattice):
+    lattice, template, driver = hwcrLattice
+    result = buildSupercells(lattice, template)
+
+    location = slugmat.convertLocation((0, 0))
+    assert list(result) == [location]
+    assert lattice[0][0].sections[1] is result[location]
+    assert result[location].scSection is driver
+
+
+def testShiftedHwcr(hwcrLattice):
+    lattice, template, driver = hwcrLattice
+    shiftAssemb(lattice[0][0], 1.0)
+    assert lattice[0][0].sections[1] is not template
+
+    # The detached copy of poison slug is still found & replaced
+    result = buildSupercells(lattice, template)
+    poison = lattice[0][0].sections[1]
+    assert result[slugmat.convertLocation((0, 0))] is poison
+    assert poison.scSection is driver and poison.name.startswith(template.name)
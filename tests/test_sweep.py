@@ -0,0 +1,52 @@
+"""
+Tests of sweep.py, which need pySARAX to build the core
+"""
+import pytest
+
+try:
+    import sweep
+    from sweep import buildLattice, buildCore, shiftLattice, writeTULIP
+except Exception as err: # pySARAX or the data of model NOT available
+    pytest.skip("The core model is NOT importable: {}".format(err), allow_module_level=True)
+
+
+def readCard(path):
+    with open(path, 'r') as f:
+        return f.read()
+
+
+def testShiftedVariantGeometry(tmp_path):
+    lattice = buildLattice()
+    variants = [
+        {'name': 'base'},
+        {'name': 'rod-05C03-10cm', 'shifts': {'05C03': 10.0}},
+        {'name': 'after'}, # Built in the same process after the shifted one
+    ]
+    results = sweep.sweep(variants, lattice=lattice, outputDir=str(tmp_path / 'sweep'), maxWorkers=1)
+    for name, result in results.items():
+        assert not isinstance(result, Exception), name
+
+    # The same shift, never moved back
+    expected = buildLattice()
+    shiftLattice(expected, {'05C03': 10.0})
+    writeTULIP(buildCore(expected), str(tmp_path / 'expected.inp'))
+
+    shiftedCard = readCard(tmp_path / 'sweep' / 'rod-05C03-10cm' / 'TPmate.inp')
+    assert shiftedCard == readCard(tmp_path / 'expected.inp')
+    baseCard = readCard(tmp_path / 'sweep' / 'base' / 'TPmate.inp')
+    assert shiftedCard != baseCard
+    assert readCard(tmp_path / 'sweep' / 'after' / 'TPmate.inp') == baseCard
+
+
+def testCopyLatticeSharesSections():
+    from types import SimpleNamespace
+
+    sec = SimpleNamespace(name='slug', height=11.43, scSection=None)
+    blank = SimpleNamespace(typeName='blank', sections=[sec])
+    driver = SimpleNamespace(typeName='driver', sections=[sec], axialShift=0.)
+    lattice = [[driver], [blank] * 6]
+
+    copied = sweep.copyLattice(lattice)
+    assert copied[0][0] is not driver and copied[0][0].sections is not driver.sections
+    assert copied[0][0].sections[0] is sec
+    assert all(assembly is copied[1][0] for assembly in copied[1]) and copied[1][0] is not blank